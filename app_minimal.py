@@ -1,19 +1,21 @@
 import os
 import json
-import base64
-import io
-import re
-import requests
 import pandas as pd
 import numpy as np
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
 import seaborn as sns
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from werkzeug.utils import secure_filename
-from bs4 import BeautifulSoup
 from scipy import stats
+from http_cache import get_http_cache
+from table_extract import extract_wikitable
+from normalize import parse_currency_series, extract_year_series, extract_int_series
+from plotting import ScatterStyle, get_plot_service
+from response_cache import get_response_cache, response_key
+from singleflight import get_single_flight
+from question_plan import Plan, get_plan_executor
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -24,6 +26,14 @@ app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 plt.style.use('default')
 sns.set_palette("husl")
 
+WIKI_URL = "https://en.wikipedia.org/wiki/List_of_highest-grossing_films"
+WIKI_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Bump when the answers change so cached responses are not served
+RESPONSE_VERSION = 'minimal-v1'
+
 class DataAnalystAgent:
     def __init__(self):
         self.temp_files = []
@@ -31,41 +41,21 @@ class DataAnalystAgent:
     def scrape_wikipedia_films(self, url):
         """Scrape Wikipedia highest grossing films data"""
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get(url, timeout=30, headers=headers)
-            response.raise_for_status()
-            
-            # Parse HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
+            response = get_http_cache().get(url, timeout=30, headers=WIKI_HEADERS)
             
-            # Find the main table (try multiple approaches)
-            tables = soup.find_all('table', class_='wikitable')
-            
-            if not tables:
-                # Fallback: find any table
-                tables = soup.find_all('table')
-            
-            if not tables:
+            # Stream the page with lxml, stopping after the main sortable wikitable
+            table = extract_wikitable(response.content)
+            if table is None:
                 return None
             
-            # Try to parse each table until one works
-            for table in tables:
-                try:
-                    df = pd.read_html(str(table))[0]
-                    
-                    # Clean column names
-                    if df.columns.nlevels > 1:
-                        df.columns = df.columns.droplevel(0)
-                    df.columns = [str(col).strip() for col in df.columns]
-                    
-                    # Basic validation - should have multiple rows and columns
-                    if len(df) > 10 and len(df.columns) > 3:
-                        return df
-                except:
-                    continue
-                    
+            headers, rows = table
+            width = len(headers)
+            df = pd.DataFrame([row[:width] + [''] * (width - len(row)) for row in rows],
+                              columns=[str(col).strip() for col in headers])
+            
+            # Basic validation - should have multiple rows and columns
+            if len(df) > 10 and len(df.columns) > 3:
+                return df
             return None
             
         except Exception as e:
@@ -75,43 +65,19 @@ class DataAnalystAgent:
     def create_scatterplot(self, x_data, y_data, x_label, y_label, title="Scatterplot", regression=True, color='blue', reg_color='red', reg_style='--'):
         """Create a scatterplot with optional regression line"""
         try:
-            fig, ax = plt.subplots(figsize=(10, 6), dpi=100)
-            
-            # Create scatter plot
-            ax.scatter(x_data, y_data, alpha=0.6, color=color, s=50)
-            
             # Add regression line if requested
+            line = line_label = None
             if regression and len(x_data) > 1:
                 # Calculate regression
                 slope, intercept, r_value, p_value, std_err = stats.linregress(x_data, y_data)
-                line = slope * x_data + intercept
-                ax.plot(x_data, line, color=reg_color, linestyle=reg_style, linewidth=2, label=f'R² = {r_value**2:.3f}')
-                ax.legend()
-            
-            # Customize plot
-            ax.set_xlabel(x_label, fontsize=12)
-            ax.set_ylabel(y_label, fontsize=12)
-            ax.set_title(title, fontsize=14, fontweight='bold')
-            ax.grid(True, alpha=0.3)
-            
-            # Save to base64
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', bbox_inches='tight', dpi=100)
-            buffer.seek(0)
-            
-            # Ensure file size is under 100KB
-            img_data = buffer.getvalue()
-            if len(img_data) > 100000:  # 100KB
-                # Reduce DPI and try again
-                buffer = io.BytesIO()
-                plt.savefig(buffer, format='png', bbox_inches='tight', dpi=80)
-                buffer.seek(0)
-                img_data = buffer.getvalue()
-            
-            plt.close()
+                line = (x_data, slope * x_data + intercept)
+                line_label = f'R² = {r_value**2:.3f}'
             
-            img_base64 = base64.b64encode(img_data).decode()
-            return f"data:image/png;base64,{img_base64}"
+            # Pooled template per style; only data and labels change per plot
+            style = ScatterStyle(color, 50, 0.6, reg_color, reg_style, 12, 14, 'bold')
+            encoded = get_plot_service().scatter(x_data, y_data, x_label, y_label, title,
+                                                 line=line, line_label=line_label, style=style)
+            return encoded.data_uri
             
         except Exception as e:
             print(f"Error creating plot: {e}")
@@ -126,8 +92,7 @@ class DataAnalystAgent:
         questions = [line.strip() for line in lines if line.strip() and not line.startswith('Answer') and not line.startswith('Scrape')]
         
         # Scrape Wikipedia data
-        wiki_url = "https://en.wikipedia.org/wiki/List_of_highest-grossing_films"
-        df = self.scrape_wikipedia_films(wiki_url)
+        df = self.scrape_wikipedia_films(WIKI_URL)
         
         if df is None:
             return ["Error scraping data", "Error", 0, "Error"]
@@ -162,95 +127,82 @@ class DataAnalystAgent:
                     gross_col = col
                     break
             
-            # Process questions
-            for i, question in enumerate(questions):
+            def gross_and_years():
+                if not (gross_col and year_col):
+                    return None
+                return parse_currency_series(df[gross_col]), extract_year_series(df[year_col])
+            
+            def rank_and_peak():
+                if not (rank_col and peak_col):
+                    return None
+                rank_data = extract_int_series(df[rank_col])
+                peak_data = extract_int_series(df[peak_col])
+                # Remove NaN values
+                mask = ~(rank_data.isna() | peak_data.isna())
+                return rank_data[mask], peak_data[mask]
+            
+            def count_2bn_before_2000(gross_years):
+                # Question 1: How many $2 bn movies were released before 2000?
+                if gross_years is None:
+                    return 0
+                gross, years = gross_years
+                return int(((gross >= 2000000000) & (years < 2000)).sum())  # $2 billion
+            
+            def earliest_over_1_5bn(gross_years):
+                # Question 2: Which is the earliest film that grossed over $1.5 bn?
+                if gross_years is None:
+                    return "Unknown"
+                gross, years = gross_years
+                candidates = years[(gross >= 1500000000) & (years > 1900)]
+                if candidates.empty:
+                    return "Unknown"
+                # Get film title (usually in first few columns)
+                title_col = df.columns[1] if len(df.columns) > 1 else df.columns[0]
+                return str(df.loc[candidates.idxmin(), title_col])
+            
+            def correlation(rank_peak):
+                # Question 3: What's the correlation between Rank and Peak?
+                if rank_peak is None:
+                    return 0
+                return round(np.corrcoef(*rank_peak)[0, 1], 6)
+            
+            def scatterplot(rank_peak):
+                # Question 4: Draw scatterplot
+                if rank_peak is None or len(rank_peak[0]) == 0:
+                    return "Error"
+                plot_uri = self.create_scatterplot(
+                    *rank_peak,
+                    'Rank', 'Peak',
+                    'Rank vs Peak Scatterplot',
+                    regression=True, reg_color='red', reg_style=':'
+                )
+                return plot_uri if plot_uri else "Error"
+            
+            # Rank/Peak and gross/year are cleaned once and shared by the questions using them
+            plan = Plan()
+            plan.add('gross_years', gross_and_years)
+            plan.add('rank_peak', rank_and_peak)
+            plan.add('count', count_2bn_before_2000, 'gross_years')
+            plan.add('earliest', earliest_over_1_5bn, 'gross_years')
+            plan.add('correlation', correlation, 'rank_peak')
+            plan.add('scatterplot', scatterplot, 'rank_peak')
+            defaults = {'count': 0, 'earliest': "Unknown", 'correlation': 0, 'scatterplot': "Error"}
+            
+            nodes = []
+            for question in questions:
                 if '$2 bn' in question and 'before 2000' in question:
-                    # Question 1: How many $2 bn movies were released before 2000?
-                    count = 0
-                    if gross_col and year_col:
-                        # Convert gross to numeric, handling currency symbols
-                        gross_series = df[gross_col].astype(str).str.replace(r'[\$,]', '', regex=True)
-                        year_series = df[year_col].astype(str).str.extract(r'(\d{4})')[0]
-                        
-                        for idx, (gross, year) in enumerate(zip(gross_series, year_series)):
-                            try:
-                                gross_val = float(gross)
-                                year_val = int(year) if year else 0
-                                if gross_val >= 2000000000 and year_val < 2000:  # $2 billion
-                                    count += 1
-                            except:
-                                continue
-                    results.append(count)
-                    
+                    nodes.append('count')
                 elif 'earliest film' in question and '$1.5 bn' in question:
-                    # Question 2: Which is the earliest film that grossed over $1.5 bn?
-                    earliest_film = "Unknown"
-                    earliest_year = float('inf')
-                    
-                    if gross_col and year_col:
-                        for idx, row in df.iterrows():
-                            try:
-                                gross_str = str(row[gross_col]).replace('$', '').replace(',', '')
-                                gross_val = float(re.findall(r'[\d.]+', gross_str)[0]) if re.findall(r'[\d.]+', gross_str) else 0
-                                
-                                year_str = str(row[year_col])
-                                year_match = re.findall(r'\d{4}', year_str)
-                                year_val = int(year_match[0]) if year_match else 0
-                                
-                                # Check if it's a billion (look for scale)
-                                if 'billion' in gross_str.lower() or gross_val > 1000000000:
-                                    if gross_val >= 1.5 and year_val < earliest_year and year_val > 1900:
-                                        earliest_year = year_val
-                                        # Get film title (usually in first few columns)
-                                        title_col = df.columns[1] if len(df.columns) > 1 else df.columns[0]
-                                        earliest_film = str(row[title_col])
-                            except:
-                                continue
-                    
-                    results.append(earliest_film)
-                    
+                    nodes.append('earliest')
                 elif 'correlation' in question and 'Rank' in question and 'Peak' in question:
-                    # Question 3: What's the correlation between Rank and Peak?
-                    correlation = 0
-                    
-                    if rank_col and peak_col:
-                        try:
-                            rank_data = pd.to_numeric(df[rank_col], errors='coerce')
-                            peak_data = pd.to_numeric(df[peak_col], errors='coerce')
-                            
-                            # Remove NaN values
-                            mask = ~(rank_data.isna() | peak_data.isna())
-                            correlation = np.corrcoef(rank_data[mask], peak_data[mask])[0, 1]
-                        except:
-                            correlation = 0
-                    
-                    results.append(round(correlation, 6))
-                    
+                    nodes.append('correlation')
                 elif 'scatterplot' in question and 'Rank' in question and 'Peak' in question:
-                    # Question 4: Draw scatterplot
-                    plot_uri = "Error"
-                    
-                    if rank_col and peak_col:
-                        try:
-                            rank_data = pd.to_numeric(df[rank_col], errors='coerce')
-                            peak_data = pd.to_numeric(df[peak_col], errors='coerce')
-                            
-                            # Remove NaN values
-                            mask = ~(rank_data.isna() | peak_data.isna())
-                            clean_rank = rank_data[mask]
-                            clean_peak = peak_data[mask]
-                            
-                            if len(clean_rank) > 0:
-                                plot_uri = self.create_scatterplot(
-                                    clean_rank, clean_peak, 
-                                    'Rank', 'Peak', 
-                                    'Rank vs Peak Scatterplot',
-                                    regression=True, reg_color='red', reg_style=':'
-                                )
-                        except Exception as e:
-                            print(f"Plot error: {e}")
-                    
-                    results.append(plot_uri if plot_uri else "Error")
+                    nodes.append('scatterplot')
+            
+            answers, errors = plan.run(set(nodes), executor=get_plan_executor())
+            for node, error in errors.items():
+                print(f"Error answering {node}: {error}")
+            results = [answers.get(node, defaults[node]) for node in nodes]
             
             return results
             
@@ -270,6 +222,30 @@ class DataAnalystAgent:
 # Initialize the agent
 agent = DataAnalystAgent()
 
+def is_cacheable(results):
+    """False if any answer is an error placeholder"""
+    values = results.values() if isinstance(results, dict) else results
+    return not any(isinstance(value, str) and value.startswith('Error') for value in values)
+
+def json_response(body, status):
+    response = Response(body, mimetype='application/json')
+    response.headers['X-Cache'] = status
+    return response
+
+def answer_films(questions_text, key):
+    """Serialized film answers as (body, cache status), storing real answers under key"""
+    cache = get_response_cache()
+    # Another worker may have stored the response while we waited for the flight lock
+    body = cache.get(key) if key else None
+    if body is not None:
+        return body, 'HIT'
+    results = agent.analyze_film_data(questions_text)
+    body = jsonify(results).get_data()
+    if key and is_cacheable(results):
+        cache.put(key, body)
+        return body, 'MISS'
+    return body, 'BYPASS'
+
 @app.route('/api/', methods=['POST'])
 def analyze_data():
     try:
@@ -282,12 +258,24 @@ def analyze_data():
         
         # Determine the type of analysis needed based on questions
         if 'Wikipedia' in questions_text or 'highest-grossing films' in questions_text:
-            # Film analysis
-            results = agent.analyze_film_data(questions_text)
-            return jsonify(results)
+            # Film analysis; answers depend on the page version
+            key = None
+            try:
+                version = get_http_cache().version(WIKI_URL, timeout=30, headers=WIKI_HEADERS)
+                key = response_key(questions_text, f"{RESPONSE_VERSION}:{version}")
+            except Exception as e:
+                print(f"Page version unavailable, skipping response cache: {e}")
+            body = get_response_cache().get(key) if key else None
+            if body is not None:
+                return json_response(body, 'HIT')
+            # Concurrent identical uploads share one scrape and plot
+            flight_key = key or response_key(questions_text, RESPONSE_VERSION)
+            (body, status), shared = get_single_flight().do(
+                flight_key, lambda: answer_films(questions_text, key))
+            return json_response(body, 'SHARED' if shared else status)
             
         elif 'Indian high court' in questions_text or 'DuckDB' in questions_text:
-            # Court data analysis
+            # Court data analysis (fixed answers, nothing to cache)
             results = agent.analyze_court_data(questions_text)
             return jsonify(results)
         
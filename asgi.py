@@ -0,0 +1,340 @@
+"""ASGI entry point serving the same routes as app:app
+
+Run with: uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+Page fetches go through an async HTTP client into the shared HTTP cache, so a
+slow upstream only parks a coroutine. Parsing, pandas, DuckDB and matplotlib
+then run on a bounded thread pool (ASGI_CPU_WORKERS) and find the page already
+cached, or in worker processes with ANALYSIS_BACKEND=process. /health never
+waits behind an analysis. MetricsMiddleware times every request for /metrics
+and, with SERVER_TIMING=1, adds a Server-Timing header.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.middleware import Middleware
+from starlette.routing import Route
+from app import (FILMS_DATA_URL, SERVICE_INDEX, analysis_kind, answer_batch, answer_questions, health_status,
+                 max_attachment_request_bytes, max_request_bytes, prewarm_in_background, profile_questions,
+                 start_court_refresher, start_job_runner, store_attachments, stream_answers, wants_stream)
+from file_lock import LockTimeout
+from lazy_imports import lazy_import
+from process_pool import analysis_backend, get_analysis_pool
+from jobs import describe_job, get_job_queue, start_job_scheduler
+import metrics
+import profiling
+import deadline
+
+logger = logging.getLogger(__name__)
+
+http_cache = lazy_import('http_cache')
+attachments = lazy_import('attachments')
+
+
+class AsyncFetcher:
+    """Fills the shared HTTP cache using an httpx.AsyncClient
+
+    Concurrent fetches of one URL within the process share a single request,
+    and across workers they take the cache's per-URL file lock like
+    HttpCache.get. Cache files and the lock are handled on the default
+    thread pool.
+    """
+
+    def __init__(self, client, cache=None):
+        self.client = client
+        self.cache = cache or http_cache.get_http_cache()
+        self._inflight = {}
+
+    async def get(self, url, timeout=30, headers=None):
+        """CachedResponse for url, fetching it only if the cached copy is stale"""
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(url, timeout, headers))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # A cancelled caller must not cancel the fetch other callers are waiting on
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url, timeout, headers):
+        cached, _, _ = await asyncio.to_thread(self.cache.fresh_copy, url)
+        if cached is not None:
+            return cached
+        # get() shields this task, so a cancelled caller cannot leave the lock taken
+        lock = self.cache.fetch_lock(url, timeout=timeout)
+        try:
+            await asyncio.to_thread(lock.__enter__)
+        except LockTimeout:
+            logger.warning(f"Another worker is still fetching {url} after {timeout:g}s, fetching it here too")
+            lock = None
+        try:
+            return await self._fetch_locked(url, timeout, headers)
+        finally:
+            if lock is not None:
+                await asyncio.to_thread(lock.__exit__, None, None, None)
+
+    async def _fetch_locked(self, url, timeout, headers):
+        # Another worker may have refreshed the entry while we waited
+        cached, meta, content = await asyncio.to_thread(self.cache.fresh_copy, url)
+        if cached is not None:
+            return cached
+        try:
+            response = await self.client.get(url, timeout=timeout, follow_redirects=True,
+                                             headers=self.cache.conditional_headers(meta, headers))
+            if response.status_code == 304 and meta is not None:
+                return await asyncio.to_thread(self.cache.record_not_modified, url, content, meta)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            if meta is None:
+                raise
+            logger.warning(f"Fetch of {url} failed, serving stale copy: {e}")
+            return http_cache.CachedResponse(url, content, meta, from_cache=True, stale=True)
+        return await asyncio.to_thread(self.cache.record_response, url, response.content, response.headers)
+
+
+class MetricsMiddleware:
+    """Observes request latency by route and reports the request's stage spans in Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        spans = metrics.track_spans()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if spans and metrics.server_timing_enabled():
+                    header = metrics.server_timing(spans).encode('latin-1')
+                    message = {**message, 'headers': [*message.get('headers', []), (b'server-timing', header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get('route')
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope['method'],
+                                            route=getattr(route, 'path', 'unmatched'), status=status)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    workers = int(os.environ.get('ASGI_CPU_WORKERS', min(4, os.cpu_count() or 1)))
+    app.state.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+    prewarm_in_background()
+    if analysis_backend() == 'process':
+        # Start the worker processes now rather than on the first request;
+        # executor threads then only wait on them
+        await asyncio.to_thread(get_analysis_pool)
+    start_job_runner()
+    start_court_refresher()
+    async with httpx.AsyncClient() as client:
+        app.state.fetcher = AsyncFetcher(client)
+        yield
+    app.state.executor.shutdown(wait=False)
+
+
+async def health_check(request):
+    """Health check endpoint for Railway"""
+    return JSONResponse(health_status())
+
+
+def too_large(request, limit):
+    """413 response when the declared Content-Length is over limit, else None"""
+    length = request.headers.get('content-length', '')
+    if length.isdigit() and int(length) > limit:
+        return JSONResponse({'error': 'Request body exceeds the upload limit'}, status_code=413)
+    return None
+
+
+async def home(request):
+    """Root endpoint"""
+    return JSONResponse(SERVICE_INDEX)
+
+
+async def analyze_data(request):
+    """Main API endpoint for data analysis"""
+    try:
+        # X-Deadline-Ms: the client's time budget; answers degrade rather than run past it
+        try:
+            budget = deadline.from_header(request.headers.get(deadline.HEADER))
+        except ValueError:
+            return JSONResponse({'error': f'{deadline.HEADER} must be a positive number of milliseconds'},
+                                status_code=400)
+
+        with deadline.scope(budget):
+            rejected = too_large(request, max_attachment_request_bytes())
+            if rejected is not None:
+                return rejected
+            form = await request.form()
+            questions_file = form.get('questions.txt')
+            if questions_file is None or isinstance(questions_file, str):
+                return JSONResponse({'error': 'questions.txt file is required'}, status_code=400)
+
+            questions_text = (await questions_file.read()).decode('utf-8')
+            logger.info(f"Received questions: {questions_text[:200]}...")
+
+            # Network I/O first, without holding an executor thread
+            if analysis_kind(questions_text) == 'films':
+                try:
+                    with metrics.span('films.prefetch'):
+                        await request.app.state.fetcher.get(FILMS_DATA_URL, timeout=deadline.timeout(30, share=0.5))
+                except Exception as e:
+                    logger.warning(f"Async fetch of {FILMS_DATA_URL} failed, the analysis will retry it: {e}")
+
+            loop = asyncio.get_running_loop()
+            # The executor thread runs in a copy of this context, so its spans reach Server-Timing
+            context = contextvars.copy_context()
+
+            # Other files are data attachments; Starlette spooled them, copy them to disk in chunks
+            uploaded, upload_dir = await asyncio.to_thread(store_attachments, [
+                (upload.filename or name, upload.file)
+                for name, upload in form.multi_items() if name != 'questions.txt' and not isinstance(upload, str)
+            ])
+            try:
+                # X-Profile: <PROFILE_TOKEN> profiles this one request
+                token = request.headers.get('X-Profile')
+                if token is not None and profiling.profiling_enabled():
+                    if not profiling.profile_authorized(token):
+                        return JSONResponse({'error': 'Invalid profile token'}, status_code=403)
+                    mode = request.headers.get('X-Profile-Format', 'pstats')
+                    if mode not in profiling.MODES:
+                        return JSONResponse({'error': f"X-Profile-Format must be one of {', '.join(profiling.MODES)}"},
+                                            status_code=400)
+                    request_id = profiling.make_request_id(request.headers.get('X-Request-Id'))
+                    body, profile_url = await loop.run_in_executor(request.app.state.executor, context.run,
+                                                                   profile_questions, questions_text, request_id, mode,
+                                                                   uploaded)
+                    return Response(body, media_type='application/json',
+                                    headers={'X-Cache': 'BYPASS', 'X-Request-Id': request_id,
+                                             'X-Profile-Url': profile_url})
+
+                # Accept: application/x-ndjson sends each answer as soon as it is computed
+                if wants_stream(request.headers.get('Accept')):
+                    stream = context.run(stream_answers, questions_text, uploaded, upload_dir)
+                    upload_dir = None  # the stream removes the uploads once it is done with them
+                    return StreamingResponse(stream, media_type='application/x-ndjson')
+
+                body, status = await loop.run_in_executor(request.app.state.executor, context.run,
+                                                          answer_questions, questions_text, uploaded)
+                return Response(body, media_type='application/json', headers={'X-Cache': status})
+            finally:
+                if upload_dir:
+                    await asyncio.to_thread(attachments.remove_uploads, upload_dir)
+
+    except attachments.UploadTooLarge as e:
+        return JSONResponse({'error': str(e)}, status_code=413)
+    except Exception as e:
+        logger.error(f"Analysis failed: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def analyze_batch(request):
+    """Answer every uploaded questions file, streaming one NDJSON line per file as it finishes"""
+    # The questions files are read into memory, so they get the small limit
+    rejected = too_large(request, max_request_bytes())
+    if rejected is not None:
+        return rejected
+    form = await request.form()
+    uploads = [(name, upload) for name, upload in form.multi_items() if not isinstance(upload, str)]
+    if not uploads:
+        return JSONResponse({'error': 'At least one questions file is required'}, status_code=400)
+    max_files = int(os.environ.get('BATCH_MAX_FILES', 50))
+    if len(uploads) > max_files:
+        return JSONResponse({'error': f'At most {max_files} questions files per batch'}, status_code=400)
+
+    files = [(upload.filename or name, (await upload.read()).decode('utf-8')) for name, upload in uploads]
+    logger.info(f"Received batch of {len(files)} questions files")
+    if any(analysis_kind(questions_text) == 'films' for _, questions_text in files):
+        try:
+            with metrics.span('films.prefetch'):
+                await request.app.state.fetcher.get(FILMS_DATA_URL, timeout=30)
+        except Exception as e:
+            logger.warning(f"Async fetch of {FILMS_DATA_URL} failed, the analysis will retry it: {e}")
+    # Starlette iterates the generator on its thread pool, so lines go out as files finish
+    return StreamingResponse(answer_batch(files), media_type='application/x-ndjson')
+
+
+async def submit_job(request):
+    """Queue an analysis and return its id at once; poll GET /api/jobs/<id> for the answers"""
+    rejected = too_large(request, max_request_bytes())
+    if rejected is not None:
+        return rejected
+    form = await request.form()
+    questions_file = form.get('questions.txt')
+    if questions_file is None or isinstance(questions_file, str):
+        return JSONResponse({'error': 'questions.txt file is required'}, status_code=400)
+
+    questions_text = (await questions_file.read()).decode('utf-8')
+    priority = form.get('priority') or request.query_params.get('priority', 'normal')
+    try:
+        job_id = await asyncio.to_thread(lambda: get_job_queue().submit(questions_text, priority))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    start_job_scheduler(answer_questions).wake()
+    logger.info(f"Queued job {job_id} ({priority})")
+    return JSONResponse({'id': job_id, 'status': 'queued', 'url': f'/api/jobs/{job_id}'},
+                        status_code=202, headers={'Location': f'/api/jobs/{job_id}'})
+
+
+async def job_status(request):
+    """Status of a queued job, with the answers once it is done"""
+    start_job_scheduler(answer_questions)
+    job = await asyncio.to_thread(lambda: get_job_queue().get(request.path_params['job_id']))
+    if job is None:
+        return JSONResponse({'error': 'Job not found'}, status_code=404)
+    return JSONResponse(describe_job(job))
+
+
+async def download_profile(request):
+    """Profile stored for a profiled request; needs the same X-Profile token"""
+    if not profiling.profile_authorized(request.headers.get('X-Profile')):
+        return JSONResponse({'error': 'Invalid profile token'}, status_code=403)
+    found = profiling.get_profile_store().find(request.path_params['request_id'])
+    if found is None:
+        return JSONResponse({'error': 'Profile not found'}, status_code=404)
+    path, mode = found
+    media_type = 'text/plain' if mode == 'collapsed' else 'application/octet-stream'
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
+
+
+async def metrics_endpoint(request):
+    """Stage and request latency histograms in the Prometheus text format"""
+    return Response(metrics.render_metrics(), headers={'Content-Type': metrics.CONTENT_TYPE})
+
+
+async def not_found(request, exc):
+    return JSONResponse({'error': 'Endpoint not found'}, status_code=404)
+
+
+async def internal_error(request, exc):
+    return JSONResponse({'error': 'Internal server error'}, status_code=500)
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health_check, methods=['GET']),
+        Route('/', home, methods=['GET']),
+        Route('/api/', analyze_data, methods=['POST']),
+        Route('/api/batch', analyze_batch, methods=['POST']),
+        Route('/api/jobs', submit_job, methods=['POST']),
+        Route('/api/jobs/{job_id}', job_status, methods=['GET']),
+        Route('/api/profiles/{request_id}', download_profile, methods=['GET']),
+        Route('/metrics', metrics_endpoint, methods=['GET']),
+    ],
+    middleware=[Middleware(MetricsMiddleware)],
+    exception_handlers={404: not_found, 500: internal_error},
+    lifespan=lifespan,
+)
@@ -0,0 +1,262 @@
+import os
+import re
+import math
+import base64
+import shutil
+import hashlib
+import logging
+import tempfile
+import datetime
+import decimal
+import uuid
+from collections import namedtuple
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPLOAD_DIR = os.path.join(tempfile.gettempdir(), 'data-analyst-agent', 'uploads')
+
+CHUNK_SIZE = 1024 * 1024
+
+SPOOL_PREFIX = 'spool-'
+
+# Extension (after dropping .gz) -> DuckDB reader; DuckDB decompresses .gz itself
+READERS = {
+    '.csv': 'read_csv',
+    '.tsv': 'read_csv',
+    '.parquet': 'read_parquet',
+    '.pq': 'read_parquet',
+    '.json': 'read_json',
+    '.jsonl': 'read_json',
+    '.ndjson': 'read_json',
+}
+
+SQL_BLOCK = re.compile(r'```sql\s*\n(.*?)```', re.DOTALL | re.IGNORECASE)
+
+Attachment = namedtuple('Attachment', 'filename table path reader nbytes digest')
+
+
+class UploadTooLarge(ValueError):
+    """The attachments of one request exceed MAX_UPLOAD_BYTES"""
+
+
+def max_upload_bytes():
+    return int(os.environ.get('MAX_UPLOAD_BYTES', 10 * 1024 ** 3))
+
+
+def _extension(filename):
+    """Lowercase extension, keeping a trailing .gz: 'a.CSV.gz' -> '.csv.gz'"""
+    name = os.path.basename(filename or '').lower()
+    if name.endswith('.gz'):
+        return os.path.splitext(name[:-3])[1] + '.gz'
+    return os.path.splitext(name)[1]
+
+
+def attachment_reader(filename):
+    """DuckDB table function for a data file name, or None for other files"""
+    return READERS.get(_extension(filename).removesuffix('.gz'))
+
+
+def table_name(filename, taken):
+    """SQL-safe view name from the file name, e.g. 'Sales 2024.csv' -> sales_2024"""
+    stem = os.path.basename(filename or 'data').lower()
+    stem = stem[:len(stem) - len(_extension(stem))]
+    name = re.sub(r'[^a-z0-9_]+', '_', stem).strip('_') or 'data'
+    if name[0].isdigit():
+        name = f"t_{name}"
+    candidate, n = name, 1
+    while candidate in taken:
+        n += 1
+        candidate = f"{name}_{n}"
+    taken.add(candidate)
+    return candidate
+
+
+def spool_file():
+    """Named temporary file in UPLOAD_DIR for the web server to write an upload into
+
+    save_upload() links it into the request's directory instead of copying
+    it; the file itself is deleted when the server closes it.
+    """
+    upload_dir = os.environ.get('UPLOAD_DIR', DEFAULT_UPLOAD_DIR)
+    os.makedirs(upload_dir, exist_ok=True)
+    return tempfile.NamedTemporaryFile('w+b', prefix=SPOOL_PREFIX, dir=upload_dir)
+
+
+def save_upload(source, path, limit):
+    """Store the file object at path; returns (bytes, sha256) or raises UploadTooLarge
+
+    A file from spool_file() is hard-linked to path and only read to hash it.
+    Other file objects are copied in chunks.
+    """
+    spooled = getattr(source, 'name', None)
+    if isinstance(spooled, str) and os.path.basename(spooled).startswith(SPOOL_PREFIX):
+        source.flush()
+        nbytes = os.path.getsize(spooled)
+        if nbytes > limit:
+            raise UploadTooLarge(f"Attachments exceed the {limit} byte upload limit")
+        try:
+            os.link(spooled, path)
+        except OSError as e:
+            logger.info(f"Copying {spooled} instead of linking it: {e}")
+            source.seek(0)
+        else:
+            with open(path, 'rb') as f:
+                return nbytes, hashlib.file_digest(f, 'sha256').hexdigest()
+    digest = hashlib.sha256()
+    nbytes = 0
+    with open(path, 'wb') as out:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            nbytes += len(chunk)
+            if nbytes > limit:
+                raise UploadTooLarge(f"Attachments exceed the {limit} byte upload limit")
+            digest.update(chunk)
+            out.write(chunk)
+    return nbytes, digest.hexdigest()
+
+
+def ingest_uploads(uploads, upload_dir=None):
+    """Stream the data files among uploads [(filename, file object)] into a new directory
+
+    Returns (attachments, directory); remove the directory with remove_uploads()
+    once the answers are computed. Files that are not CSV/Parquet/JSON are skipped.
+    """
+    upload_dir = upload_dir or os.environ.get('UPLOAD_DIR', DEFAULT_UPLOAD_DIR)
+    os.makedirs(upload_dir, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix='request-', dir=upload_dir)
+    remaining = max_upload_bytes()
+    taken = set()
+    attachments = []
+    try:
+        for filename, source in uploads:
+            reader = attachment_reader(filename)
+            if reader is None:
+                logger.info(f"Ignoring attachment {filename!r}: not CSV, Parquet or JSON")
+                continue
+            table = table_name(filename, taken)
+            path = os.path.join(directory, f"{table}{_extension(filename)}")
+            nbytes, digest = save_upload(source, path, remaining)
+            remaining -= nbytes
+            attachments.append(Attachment(filename, table, path, reader, nbytes, digest))
+            logger.info(f"Stored attachment {filename} as {table} ({nbytes} bytes)")
+    except Exception:
+        remove_uploads(directory)
+        raise
+    return attachments, directory
+
+
+def remove_uploads(directory):
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def attachments_version(attachments):
+    """Fingerprint of the attachments' names and contents, for the response cache"""
+    digest = hashlib.sha256()
+    for attachment in attachments:
+        digest.update(f"{attachment.table}:{attachment.digest}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def json_value(value):
+    """A DuckDB result value as something the JSON encoder accepts, e.g. INTERVAL -> seconds"""
+    if isinstance(value, dict):
+        return {str(key): json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_value(item) for item in value]
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, decimal.Decimal):
+        return float(value) if value.is_finite() else None
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def extract_sql(questions_text):
+    """The ```sql fenced blocks in the questions"""
+    return [block.strip() for block in SQL_BLOCK.findall(questions_text) if block.strip()]
+
+
+class AttachmentDatabase:
+    """Attachments as DuckDB views over the stored files, queried out of core
+
+    The connection has a memory limit, spills to the upload directory, and
+    can only read files in that directory, so SQL from the questions cannot
+    reach the rest of the filesystem.
+    """
+
+    def __init__(self, attachments, memory_limit=None, max_rows=None):
+        self.attachments = list(attachments)
+        self.max_rows = int(max_rows or os.environ.get('ATTACHMENT_MAX_ROWS', 1000))
+        directory = os.path.dirname(self.attachments[0].path)
+        config = {
+            'memory_limit': memory_limit or os.environ.get('ATTACHMENT_MEMORY_LIMIT', '512MB'),
+            'temp_directory': os.path.join(directory, 'spill'),
+        }
+        threads = os.environ.get('DUCKDB_THREADS')
+        if threads:
+            config['threads'] = int(threads)
+        self.conn = duckdb.connect(config=config)
+        for attachment in self.attachments:
+            path = attachment.path.replace("'", "''")
+            self.conn.execute(
+                f'CREATE VIEW "{attachment.table}" AS SELECT * FROM {attachment.reader}(\'{path}\')'
+            )
+        quoted = directory.replace("'", "''")
+        try:
+            self.conn.execute(f"SET allowed_directories = ['{quoted}/']")
+        except duckdb.Error as e:
+            # Older DuckDB has no allowed_directories; without it the questions' SQL could read any file
+            self.conn.close()
+            raise RuntimeError(f"DuckDB {duckdb.__version__} cannot restrict queries to the upload directory") from e
+        self.conn.execute("SET enable_external_access = false")
+        self.conn.execute("SET lock_configuration = true")
+
+    def summaries(self):
+        """Row count and per-column statistics of every attachment, one streaming pass each"""
+        results = []
+        for attachment in self.attachments:
+            cursor = self.conn.execute(f'SUMMARIZE "{attachment.table}"')
+            names = [column[0] for column in cursor.description]
+            columns = [dict(zip(names, json_value(row))) for row in cursor.fetchall()]
+            results.append({
+                'table': attachment.table,
+                'file': attachment.filename,
+                'rows': columns[0]['count'] if columns else 0,
+                'columns': [
+                    {key: column[key] for key in ('column_name', 'column_type', 'min', 'max', 'avg', 'null_percentage')}
+                    for column in columns
+                ],
+            })
+        return results
+
+    def query(self, sql):
+        """Rows of sql as JSON-ready records, at most max_rows of them
+
+        The limit is part of the query plan, so DuckDB stops after max_rows
+        rows instead of materializing the whole result first.
+        """
+        relation = self.conn.sql(sql)
+        if relation is None:
+            # A statement without a result, e.g. CREATE TABLE
+            return []
+        names = relation.columns
+        return [dict(zip(names, json_value(row))) for row in relation.limit(self.max_rows).fetchall()]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
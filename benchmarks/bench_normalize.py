@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: vectorized currency/year parsing vs the per-row .apply() it replaced
+
+Usage:
+    python benchmarks/bench_normalize.py [--rows 1000000]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalize import parse_currency_series, extract_year_series  # noqa: E402
+
+
+def legacy_parse_currency(value):
+    """DataAnalyst.parse_currency before the vectorized module"""
+    if pd.isna(value) or value == '':
+        return 0
+    value = str(value).replace('$', '').replace(',', '').replace('billion', '000000000').replace('million', '000000')
+    match = re.search(r'[\d.]+', value)
+    if match:
+        try:
+            return float(match.group())
+        except ValueError:
+            return 0
+    return 0
+
+
+def legacy_extract_year(value):
+    """DataAnalyst.extract_year before the vectorized module"""
+    if pd.isna(value):
+        return None
+    match = re.search(r'(19|20)\d{2}', str(value))
+    return int(match.group()) if match else None
+
+
+def synthetic_table(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(100_000_000, 3_000_000_000, rows)
+    prefixes = rng.choice(['', '', 'T', 'F8'], rows)
+    notes = rng.choice(['', '', '[1]', '[a]'], rows)
+    gross = pd.Series([f"{p}${a:,}{n}" for p, a, n in zip(prefixes, amounts, notes)])
+    years = rng.integers(1937, 2025, rows)
+    ranges = rng.random(rows) < 0.05
+    year = pd.Series([f"{y}–{y + 1}" if r else str(y) for y, r in zip(years, ranges)])
+    return pd.DataFrame({'gross': gross, 'year': year})
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = synthetic_table(args.rows)
+    print(f"Rows: {args.rows:,}")
+
+    legacy_gross, _ = timed(lambda: df['gross'].apply(legacy_parse_currency))
+    fast_gross, _ = timed(lambda: parse_currency_series(df['gross']))
+    print(f"currency  apply: {legacy_gross:7.2f}s  vectorized: {fast_gross:7.2f}s  ({legacy_gross / fast_gross:.1f}x)")
+
+    legacy_year, _ = timed(lambda: df['year'].apply(legacy_extract_year))
+    fast_year, _ = timed(lambda: extract_year_series(df['year']))
+    print(f"year      apply: {legacy_year:7.2f}s  vectorized: {fast_year:7.2f}s  ({legacy_year / fast_year:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Compare the lxml table extractor with the previous BeautifulSoup parser
+
+Usage:
+    python benchmarks/bench_table_extract.py                 # synthetic page
+    python benchmarks/bench_table_extract.py --html page.html  # saved copy of the Wikipedia page
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from table_extract import extract_wikitable  # noqa: E402
+from benchmarks.fixtures import make_films_html  # noqa: E402
+
+
+def legacy_extract(html):
+    """The html.parser extraction DataAnalyst.scrape_wikipedia_films used before"""
+    soup = BeautifulSoup(html, 'html.parser')
+    tables = soup.find_all('table', class_='wikitable')
+    table = next((t for t in tables if 'sortable' in t.get('class', [])), tables[0])
+    headers = [th.get_text(strip=True) for th in table.find('tr').find_all(['th', 'td'])]
+    rows = []
+    for tr in table.find_all('tr')[1:]:
+        row = []
+        for td in tr.find_all(['td', 'th']):
+            text = re.sub(r'\[.*?\]', '', td.get_text(strip=True))
+            row.append(re.sub(r'\s+', ' ', text))
+        if row:
+            rows.append(row)
+    return headers, rows
+
+
+def best_of(fn, html, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(html)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--html', help='saved copy of the films page (default: synthetic page)')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.html:
+        with open(args.html, 'rb') as f:
+            html = f.read()
+    else:
+        html = make_films_html()
+
+    legacy_time, (legacy_headers, legacy_rows) = best_of(legacy_extract, html, args.repeat)
+    lxml_time, (headers, rows) = best_of(extract_wikitable, html, args.repeat)
+
+    print(f"Page size:        {len(html) / 1024:.0f} KB")
+    print(f"BeautifulSoup:    {legacy_time * 1000:8.2f} ms  ({len(legacy_rows)} rows)")
+    print(f"lxml iterparse:   {lxml_time * 1000:8.2f} ms  ({len(rows)} rows)")
+    print(f"Speedup:          {legacy_time / lxml_time:8.1f}x")
+    if headers != legacy_headers or len(rows) != len(legacy_rows):
+        print("⚠️  Outputs differ (the lxml path expands rowspan/colspan and keeps spaces between inline elements)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Synthetic inputs for the benchmarks, so they run without network access"""
+
+import os
+import random
+
+FILMS = [
+    ("Avatar", 2009, 2923706026), ("Avengers: Endgame", 2019, 2799439100),
+    ("Avatar: The Way of Water", 2022, 2320250281), ("Titanic", 1997, 2257844554),
+    ("Star Wars: The Force Awakens", 2015, 2068223624), ("Avengers: Infinity War", 2018, 2048359754),
+    ("Spider-Man: No Way Home", 2021, 1921847111), ("Inside Out 2", 2024, 1698863816),
+    ("Jurassic World", 2015, 1671537444), ("The Lion King", 2019, 1656943394),
+    ("The Avengers", 2012, 1520538536), ("Furious 7", 2015, 1515341399),
+    ("Top Gun: Maverick", 2022, 1495696292), ("Frozen II", 2019, 1453683476),
+    ("Barbie", 2023, 1445638421), ("Avengers: Age of Ultron", 2015, 1405018048),
+    ("The Super Mario Bros. Movie", 2023, 1361992475), ("Black Panther", 2018, 1347280838),
+    ("Harry Potter and the Deathly Hallows – Part 2", 2011, 1342499744),
+    ("Star Wars: The Last Jedi", 2017, 1332698830),
+]
+
+
+def make_films_html(n_rows=50, padding_paragraphs=2000, seed=0):
+    """HTML shaped like the Wikipedia films page: prose, the sortable table, more prose
+
+    Gross cells carry footnote prefixes and Peak cells citation markers,
+    as on the real page.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_rows):
+        title, year, gross = FILMS[i % len(FILMS)]
+        if i >= len(FILMS):
+            title = f"{title} {i // len(FILMS) + 1}"
+            gross = max(gross - 10_000_000 * i, 900_000_000)
+        peak = max(1, i + 1 - rng.randint(0, 3))
+        prefix = rng.choice(['', '', '', 'T', 'F8'])
+        rows.append(
+            f'<tr><td>{i + 1}</td><td>{peak}<sup class="reference"><a href="#c{i}">[# {i}]</a></sup></td>'
+            f'<th scope="row"><i><a href="/wiki/F{i}">{title}</a></i></th>'
+            f'<td><span>{prefix}</span>${gross:,}</td><td><a href="/wiki/{year}_in_film">{year}</a></td>'
+            f'<td><sup class="reference"><a href="#r{i}">[{i + 1}]</a></sup></td></tr>'
+        )
+    filler = ''.join(
+        f'<p>Paragraph {i} about box office history with <a href="/wiki/L{i}">links</a> '
+        f'and <b>markup</b> and a citation<sup class="reference"><a href="#n{i}">[{i}]</a></sup>.</p>'
+        for i in range(padding_paragraphs // 2)
+    )
+    return (
+        '<!DOCTYPE html><html><head><title>List of highest-grossing films</title></head><body>'
+        '<div id="content">' + filler +
+        '<table class="wikitable sortable plainrowheaders"><caption>Highest-grossing films</caption>'
+        '<tbody><tr><th>Rank</th><th>Peak</th><th>Title</th><th>Worldwide gross</th><th>Year</th><th>Ref</th></tr>'
+        + ''.join(rows) + '</tbody></table>' + filler +
+        '<table class="wikitable"><tr><th>Year</th><th>Title</th></tr><tr><td>1915</td><td>Old</td></tr></table>'
+        '</div></body></html>'
+    ).encode('utf-8')
+
+
+COURTS = ('33_10', '7_26', '1_12', '9_13', '27_1')
+
+
+def make_court_dataset(root, years=range(2017, 2024), courts=COURTS, benches=('b1', 'b2', 'b3'),
+                       rows_per_bench=2000, seed=0):
+    """Write a year=*/court=*/bench=*/metadata.parquet tree shaped like the judgments metadata
+
+    Returns the number of rows written.
+    """
+    import duckdb
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    con = duckdb.connect()
+    total = 0
+    try:
+        for year in years:
+            for c, court in enumerate(courts):
+                for bench in benches:
+                    registered = (np.datetime64(f'{year - 2}-01-01')
+                                  + rng.integers(0, 730, rows_per_bench).astype('timedelta64[D]'))
+                    # Delays grow a little each year and differ by court
+                    delays = rng.gamma(2.0, 60 + 15 * c + 10 * (year - years[0]), rows_per_bench).astype('int64')
+                    frame = pd.DataFrame({
+                        'date_of_registration': pd.to_datetime(registered).strftime('%d-%m-%Y'),
+                        'decision_date': pd.to_datetime(registered + delays.astype('timedelta64[D]')).date,
+                        'title': [f'{court}/{bench}/{year}/{i}' for i in range(rows_per_bench)],
+                    })
+                    part = os.path.join(root, f'year={year}', f'court={court}', f'bench={bench}')
+                    os.makedirs(part, exist_ok=True)
+                    con.register('part_df', frame)
+                    con.execute(f"COPY part_df TO '{part}/metadata.parquet' (FORMAT PARQUET)")
+                    con.unregister('part_df')
+                    total += len(frame)
+    finally:
+        con.close()
+    return total
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Load test: latency percentiles, error rate and RSS of a local server under a question mix
+
+Starts gunicorn (app:app) with the given workers/threads, a stub films page
+and a synthetic court dataset, then drives /api/ at each arrival rate in turn
+(open loop, Poisson arrivals). Latency is measured from each request's
+scheduled start, so a saturated server shows up as queueing, not as a lower
+request rate. RSS of the server and its workers is sampled every second.
+
+Usage:
+    python benchmarks/loadtest.py --workers 2 --threads 4 --rates 1,2,4,8 --duration 30
+    python benchmarks/loadtest.py --mix films=6,court=3,generic=1 --unique 0.2
+    python benchmarks/loadtest.py --url http://localhost:5000 --pid <gunicorn master pid>
+
+--unique is the fraction of requests made distinct (a trailing comment line),
+so that they miss the response cache; 1.0 measures the analysis itself.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import make_court_dataset  # noqa: E402
+from benchmarks.run_benchmarks import (  # noqa: E402
+    COURT_QUESTIONS, FILMS_QUESTIONS, GENERIC_QUESTIONS, start_stub_server,
+)
+
+QUESTIONS = {'films': FILMS_QUESTIONS, 'court': COURT_QUESTIONS, 'generic': GENERIC_QUESTIONS}
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in QUESTIONS:
+            raise argparse.ArgumentTypeError(f"unknown question kind {name!r}; use {', '.join(QUESTIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def process_tree(pid):
+    """pid and all of its descendants, from /proc"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; the parent pid follows its closing ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, ()))
+    return tree
+
+
+def rss_bytes(pid):
+    """Resident memory of pid and its descendants (0 if unavailable)"""
+    total = 0
+    for member in process_tree(pid):
+        try:
+            with open(f'/proc/{member}/statm') as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+
+class RssSampler:
+    """Samples the server's total RSS every interval seconds in a background thread"""
+
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []  # (seconds since start, MB)
+        self._stop = threading.Event()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._loop, name='rss-sampler', daemon=True)
+        if pid and os.path.exists('/proc'):
+            self._thread.start()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.samples.append((round(time.perf_counter() - self._started, 1), round(rss_bytes(self.pid) / 2**20, 1)))
+            self._stop.wait(self.interval)
+
+    def peak_since(self, since):
+        values = [mb for at, mb in self.samples if at >= since]
+        return max(values) if values else None
+
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def close(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, work_dir, films_url, court_path):
+    """gunicorn app:app on a free port with the fixtures; returns (process, base url)"""
+    port = free_port()
+    env = dict(os.environ, FILMS_DATA_URL=films_url, COURT_DATA_PATH=court_path,
+               HTTP_CACHE_DIR=os.path.join(work_dir, 'http'), TABLE_CACHE_DIR=os.path.join(work_dir, 'tables'),
+               RESPONSE_CACHE_DIR=os.path.join(work_dir, 'responses'),
+               COURT_CACHE_DIR=os.path.join(work_dir, 'court-cache'),
+               SINGLE_FLIGHT_DIR=os.path.join(work_dir, 'flights'), JOBS_DB=os.path.join(work_dir, 'jobs.sqlite3'))
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(args.workers), '--threads', str(args.threads), '--timeout', '300',
+               '--log-level', 'warning']
+    with open(args.server_log, 'ab') as log:
+        process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            if requests.get(f'{base_url}/health', timeout=1).ok:
+                return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not become healthy within 60s")
+
+
+class LoadGenerator:
+    """Open-loop request schedule against /api/ with a weighted question mix"""
+
+    def __init__(self, base_url, mix, unique, timeout, max_in_flight, seed=0):
+        self.url = f"{base_url.rstrip('/')}/api/"
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.unique = unique
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.sent = 0
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='load')
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _request(self, kind, questions, scheduled):
+        try:
+            response = self._session().post(self.url, files={'questions.txt': ('questions.txt', questions)},
+                                            timeout=self.timeout)
+            ok = response.status_code == 200
+            cache = response.headers.get('X-Cache')
+        except requests.RequestException:
+            ok, cache = False, None
+        return kind, ok, cache, time.perf_counter() - scheduled
+
+    def run(self, rate, duration):
+        """Send Poisson arrivals at rate per second for duration seconds; returns the outcomes"""
+        futures = []
+        started = time.perf_counter()
+        next_at = started
+        while next_at < started + duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            questions = QUESTIONS[kind]
+            if self.rng.random() < self.unique:
+                questions = f"{questions}\n# load test request {self.sent}\n"
+            self.sent += 1
+            futures.append(self._executor.submit(self._request, kind, questions.encode(), next_at))
+            next_at += self.rng.expovariate(rate)
+        outcomes = [future.result() for future in futures]
+        return outcomes, time.perf_counter() - started
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def summarize(rate, outcomes, elapsed, peak_rss):
+    latencies = [latency * 1000 for _, ok, _, latency in outcomes if ok]
+    errors = sum(1 for _, ok, _, _ in outcomes if not ok)
+    by_kind = {}
+    for kind, ok, _, latency in outcomes:
+        if ok:
+            by_kind.setdefault(kind, []).append(latency * 1000)
+    caches = {}
+    for _, _, cache, _ in outcomes:
+        if cache:
+            caches[cache] = caches.get(cache, 0) + 1
+
+    def rounded(value):
+        return round(value, 1) if value is not None else None
+
+    return {
+        'rate': rate,
+        'sent': len(outcomes),
+        'ok': len(latencies),
+        'error_rate': round(errors / len(outcomes), 4) if outcomes else 0.0,
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': rounded(percentile(latencies, 50)),
+        'p95_ms': rounded(percentile(latencies, 95)),
+        'p99_ms': rounded(percentile(latencies, 99)),
+        'p99_ms_by_kind': {kind: rounded(percentile(values, 99)) for kind, values in sorted(by_kind.items())},
+        'cache': caches,
+        'peak_rss_mb': peak_rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='load an already running server instead of starting gunicorn')
+    parser.add_argument('--pid', type=int, help='with --url, the server pid whose RSS (with children) to sample')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--rates', default='1,2,4', help='arrival rates to step through, requests/second')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per rate')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('films=5,court=3,generic=2'),
+                        help='question kinds and weights')
+    parser.add_argument('--unique', type=float, default=1.0, help='fraction of requests that miss the response cache')
+    parser.add_argument('--max-in-flight', type=int, default=64, help='client-side cap on concurrent requests')
+    parser.add_argument('--timeout', type=float, default=300, help='per-request timeout, seconds')
+    parser.add_argument('--court-rows', type=int, default=2000, help='rows per court bench partition')
+    parser.add_argument('--output', help='write the results (with the RSS timeline) as JSON here')
+    parser.add_argument('--server-log', default=os.devnull, help="append gunicorn's and the app's logs here")
+    args = parser.parse_args()
+    rates = [float(rate) for rate in args.rates.split(',')]
+
+    work_dir = tempfile.mkdtemp(prefix='analyst-load-')
+    stub, films_url = start_stub_server()
+    server = None
+    sampler = None
+    try:
+        if args.url:
+            base_url, pid = args.url, args.pid
+        else:
+            court_path = os.path.join(work_dir, 'court')
+            make_court_dataset(court_path, rows_per_bench=args.court_rows)
+            server, base_url = start_server(args, work_dir, films_url, court_path)
+            pid = server.pid
+        sampler = RssSampler(pid)
+        generator = LoadGenerator(base_url, args.mix, args.unique, args.timeout, args.max_in_flight)
+
+        print(f"{'rate/s':>7} {'sent':>5} {'err%':>6} {'ok/s':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>7}")
+        steps = []
+        try:
+            for rate in rates:
+                since = sampler.elapsed()
+                outcomes, elapsed = generator.run(rate, args.duration)
+                step = summarize(rate, outcomes, elapsed, sampler.peak_since(since))
+                steps.append(step)
+                print(f"{rate:>7g} {step['sent']:>5} {step['error_rate'] * 100:>6.1f} {step['throughput']:>6.2f} "
+                      f"{step['p50_ms'] or 0:>8.0f} {step['p95_ms'] or 0:>8.0f} {step['p99_ms'] or 0:>8.0f} "
+                      f"{step['peak_rss_mb'] or 0:>7.0f}")
+        finally:
+            generator.close()
+    finally:
+        if sampler is not None:
+            sampler.close()
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+        stub.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'settings': {'workers': args.workers, 'threads': args.threads, 'mix': args.mix,
+                             'unique': args.unique, 'duration': args.duration, 'url': args.url},
+                'steps': steps,
+                'rss_mb': sampler.samples,
+            }, f, indent=2)
+            f.write('\n')
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: per-stage and end-to-end /api/ timings against local fixtures
+
+The films page is served by a stub HTTP server (FILMS_DATA_URL) and the court
+questions run on a synthetic Parquet dataset, so runs are repeatable offline.
+Each scenario posts a questions file through Flask's test client; stage times
+(films.fetch, films.parse, films.clean, films.stats, plot.draw, plot.encode,
+court.query, ...) come from the app's Server-Timing header.
+"cold" scenarios start from empty caches, "cached" ones repeat the request.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--repeat 5] [--output bench.json]
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json [--threshold 0.25]
+
+No baseline is committed: timings depend on the machine, so make one there
+first. Check out the base commit (e.g. main), run with --save-baseline, then
+switch back to the change and run with --baseline pointing at that file.
+Both runs should use the same machine, Python and --repeat.
+
+With --baseline, exits 1 if a scenario total or stage median is more than
+threshold slower than the baseline (and by at least --min-delta-ms).
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import make_court_dataset, make_films_html  # noqa: E402
+
+FILMS_QUESTIONS = """Scrape the list of highest grossing films from Wikipedia. It is at the URL:
+https://en.wikipedia.org/wiki/List_of_highest-grossing_films
+
+Answer the following questions and respond with a JSON array of strings containing the answer.
+
+1. How many $2 bn movies were released before 2000?
+2. Which is the earliest film that grossed over $1.5 bn?
+3. What's the correlation between the Rank and Peak?
+4. Draw a scatterplot of Rank and Peak along with a dotted red regression line through it.
+"""
+
+COURT_QUESTIONS = """The Indian high court judgement dataset (indian-high-court-judgments) is queried with DuckDB.
+
+Answer the following questions and respond with a JSON object containing the answer.
+
+{
+  "Which high court disposed the most cases from 2019 - 2022?": "...",
+  "What's the regression slope of the date_of_registration - decision_date by year in the court=33_10?": "...",
+  "Plot the year and # of days of delay from the above question as a scatterplot with a regression line. Encode as a base64 data URI under 100,000 characters": "data:image/webp:base64,..."
+}
+"""
+
+GENERIC_QUESTIONS = "What is the mean of the uploaded numbers?"
+
+# name -> (questions, start from empty caches)
+SCENARIOS = {
+    'films_cold': (FILMS_QUESTIONS, True),
+    'films_cached': (FILMS_QUESTIONS, False),
+    'court_cold': (COURT_QUESTIONS, True),
+    'court_cached': (COURT_QUESTIONS, False),
+    'generic': (GENERIC_QUESTIONS, True),
+}
+
+CACHE_DIRS = ('HTTP_CACHE_DIR', 'TABLE_CACHE_DIR', 'RESPONSE_CACHE_DIR', 'COURT_CACHE_DIR')
+
+
+class FilmsPage(BaseHTTPRequestHandler):
+    """Serves the synthetic films page, like Wikipedia but local"""
+
+    html = make_films_html()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=UTF-8')
+        self.send_header('Content-Length', str(len(self.html)))
+        self.send_header('ETag', '"films-fixture"')
+        self.end_headers()
+        self.wfile.write(self.html)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FilmsPage)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/wiki/List_of_highest-grossing_films"
+
+
+def configure_environment(work_dir, films_url, court_path):
+    """Point the app at the fixtures and at private cache directories; call before importing app"""
+    os.environ.update({
+        'FILMS_DATA_URL': films_url,
+        'COURT_DATA_PATH': court_path,
+        'SERVER_TIMING': '1',
+        'ANALYSIS_BACKEND': 'thread',
+        'SINGLE_FLIGHT_DIR': os.path.join(work_dir, 'flights'),
+        'JOBS_DB': os.path.join(work_dir, 'jobs.sqlite3'),
+    })
+    os.environ.pop('PROFILE_TOKEN', None)
+
+
+def reset_caches(work_dir, run):
+    """Fresh, empty cache directories and process-wide cache objects"""
+    import court_summary
+    import http_cache
+    import response_cache
+    import table_cache
+
+    for name in CACHE_DIRS:
+        os.environ[name] = os.path.join(work_dir, f'run-{run}', name.lower())
+    http_cache._http_cache = None
+    table_cache._table_cache = None
+    response_cache._response_cache = None
+    court_summary._summary_cache.close()
+    court_summary._summary_cache = court_summary.CourtSummaryCache()
+
+
+def refresh_court_summary():
+    """Check the court dataset and build its summary now, as the server's background refresh would"""
+    import court_engine
+    import court_summary
+
+    with court_engine.get_court_pool().engine() as engine:
+        court_summary._summary_cache.refresh(engine)
+
+
+def parse_server_timing(header):
+    stages = {}
+    for entry in filter(None, (part.strip() for part in (header or '').split(','))):
+        name, _, duration = entry.partition(';dur=')
+        stages[name] = float(duration)
+    return stages
+
+
+def post(client, questions):
+    started = time.perf_counter()
+    response = client.post('/api/', data={'questions.txt': (io.BytesIO(questions.encode()), 'questions.txt')})
+    elapsed = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/ returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return elapsed, response.headers.get('X-Cache'), parse_server_timing(response.headers.get('Server-Timing'))
+
+
+def run_scenario(client, work_dir, name, repeat, warmup):
+    questions, cold = SCENARIOS[name]
+    totals = []
+    stages = {}
+    statuses = set()
+    for run in range(warmup + repeat):
+        if cold or run == 0:
+            reset_caches(work_dir, f'{name}-{run}')
+        if not cold:
+            refresh_court_summary()
+            post(client, questions)  # fills the caches the measured request hits
+        elapsed, status, timings = post(client, questions)
+        if run < warmup:
+            continue
+        totals.append(elapsed)
+        statuses.add(status)
+        for stage, duration in timings.items():
+            stages.setdefault(stage, []).append(duration)
+    return {
+        'total_ms': {
+            'median': round(statistics.median(totals), 2),
+            'min': round(min(totals), 2),
+            'max': round(max(totals), 2),
+        },
+        'stages_ms': {stage: round(statistics.median(values), 2) for stage, values in sorted(stages.items())},
+        'cache': sorted(s for s in statuses if s),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Print current vs baseline medians and return the regressions found"""
+    regressions = []
+    print(f"\n{'metric':<36} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, scenario in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            print(f"{name:<36} {'-':>10} {scenario['total_ms']['median']:>10.2f}      new")
+            continue
+        pairs = [(f"{name}", base['total_ms']['median'], scenario['total_ms']['median'])]
+        pairs += [(f"{name}:{stage}", base['stages_ms'][stage], value)
+                  for stage, value in scenario['stages_ms'].items() if stage in base['stages_ms']]
+        for metric, old, new in pairs:
+            change = (new - old) / old if old else 0.0
+            flag = ''
+            if new > old * (1 + threshold) and new - old >= min_delta_ms:
+                flag = '  REGRESSION'
+                regressions.append(metric)
+            print(f"{metric:<36} {old:>10.2f} {new:>10.2f} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='measured runs per scenario')
+    parser.add_argument('--warmup', type=int, default=1, help='unmeasured runs per scenario first')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='run only this scenario (repeatable)')
+    parser.add_argument('--court-rows', type=int, default=2000, help='rows per court bench partition')
+    parser.add_argument('--output', help='write the results JSON here')
+    parser.add_argument('--save-baseline', help='write the results JSON here as the new baseline')
+    parser.add_argument('--baseline', help='compare against this results JSON')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown, as a fraction')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0, help='ignore slowdowns smaller than this')
+    parser.add_argument('--verbose', action='store_true', help="show the app's INFO logs")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='analyst-bench-')
+    server, films_url = start_stub_server()
+    try:
+        court_path = os.path.join(work_dir, 'court')
+        rows = make_court_dataset(court_path, rows_per_bench=args.court_rows)
+        configure_environment(work_dir, films_url, court_path)
+        import app
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        client = app.app.test_client()
+        results = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'repeat': args.repeat,
+                'court_rows': rows,
+            },
+            'scenarios': {},
+        }
+        for name in args.scenario or SCENARIOS:
+            scenario = run_scenario(client, work_dir, name, args.repeat, args.warmup)
+            results['scenarios'][name] = scenario
+            stages = ', '.join(f"{stage} {value:.1f}" for stage, value in scenario['stages_ms'].items())
+            print(f"{name:<14} {scenario['total_ms']['median']:9.2f} ms  [{'/'.join(scenario['cache'])}]  {stages}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"Wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n⚠️  {len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\n✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Shared fixtures and helpers for the tests
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+FILMS_QUESTIONS = """Scrape the list of highest grossing films from Wikipedia. It is at the URL:
+https://en.wikipedia.org/wiki/List_of_highest-grossing_films
+
+1. How many $2 bn movies were released before 2000?
+2. Which is the earliest film that grossed over $1.5 bn?
+3. What's the correlation between the Rank and Peak?
+4. Draw a scatterplot of Rank and Peak along with a dotted red regression line through it.
+"""
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves /page/<n> with an ETag and answers If-None-Match with 304"""
+
+    def do_GET(self):
+        server = self.server
+        server.hits.append((self.path, self.headers.get('If-None-Match')))
+        if server.fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = server.pages.get(self.path, b'')
+        etag = f'"{hash(body)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def stub_server(pages):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.pages = pages
+    server.hits = []
+    server.fail = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def caches(tmp_path, monkeypatch):
+    """Point every process-wide cache, lock and state directory at tmp_path"""
+    import court_summary
+    import jobs
+    import profiling
+    from http_cache import HttpCache
+    from response_cache import ResponseCache
+    from singleflight import SingleFlight
+    from table_cache import TableCache
+
+    monkeypatch.setenv('SINGLE_FLIGHT_DIR', str(tmp_path / 'locks'))
+    monkeypatch.setenv('COURT_CACHE_DIR', str(tmp_path / 'court'))
+    monkeypatch.setenv('JOBS_DB', str(tmp_path / 'jobs.sqlite3'))
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path / 'profiles'))
+    monkeypatch.setenv('UPLOAD_DIR', str(tmp_path / 'uploads'))
+    monkeypatch.setattr('http_cache._http_cache', HttpCache(str(tmp_path / 'http')))
+    monkeypatch.setattr('table_cache._table_cache', TableCache(str(tmp_path / 'tables')))
+    monkeypatch.setattr('response_cache._response_cache', ResponseCache(cache_dir=str(tmp_path / 'responses')))
+    monkeypatch.setattr('singleflight._single_flight', SingleFlight())
+    monkeypatch.setattr(court_summary, '_summary_cache', court_summary.CourtSummaryCache())
+    monkeypatch.setattr(jobs, '_job_queue', None)
+    monkeypatch.setattr(jobs, '_scheduler', None)
+    monkeypatch.setattr(profiling, '_profile_store', None)
+    yield tmp_path
+    if jobs._scheduler is not None:
+        jobs._scheduler.close()
+    court_summary._summary_cache.close()
+
+
+@pytest.fixture
+def films_page(caches):
+    """The fixture films page, cached as if just fetched from FILMS_URL"""
+    from app import FILMS_URL
+    from benchmarks.fixtures import make_films_html
+    from http_cache import get_http_cache
+    get_http_cache()._store(FILMS_URL, make_films_html(), {'url': FILMS_URL, 'fetched_at': time.time(), 'etag': 'fixture'})
+    return FILMS_URL
@@ -0,0 +1,257 @@
+import os
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+import duckdb
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Root of the year=*/court=*/bench=*/metadata.parquet tree. Point COURT_DATA_PATH
+# at a local directory with the same layout to run against a local copy.
+DEFAULT_COURT_DATA_PATH = 's3://indian-high-court-judgments/metadata/parquet'
+DEFAULT_S3_REGION = 'ap-south-1'
+PARTITION_FILE = 'metadata.parquet'
+
+# Days between registration and decision. date_of_registration is stored as
+# a dd-mm-yyyy string, decision_date as a DATE. The question writes the pair
+# as "date_of_registration - decision_date", but its follow-up plots the same
+# numbers as "# of days of delay", so this is decision minus registration:
+# positive days, and a slope that is positive when cases take longer.
+DELAY_DAYS_SQL = (
+    "date_diff('day', CAST(try_strptime(date_of_registration, '%d-%m-%Y') AS DATE), "
+    "CAST(decision_date AS DATE))"
+)
+
+# The questions in test_court_questions.txt; their statements are prepared
+# as soon as a pooled cursor is created.
+STANDARD_YEAR_RANGE = (2019, 2022)
+STANDARD_COURT = '33_10'
+
+
+def configure_connection(conn, data_path, s3_region=DEFAULT_S3_REGION):
+    """Load the extensions needed to read the dataset"""
+    if data_path.startswith('s3://'):
+        conn.execute("INSTALL httpfs; LOAD httpfs;")
+        conn.execute(f"SET s3_region='{s3_region}'")
+
+
+class CourtQueryEngine:
+    """Run the court questions with DuckDB against the partitioned metadata"""
+
+    def __init__(self, data_path=None, connection=None):
+        self.data_path = (data_path or os.environ.get('COURT_DATA_PATH', DEFAULT_COURT_DATA_PATH)).rstrip('/')
+        self.s3_region = os.environ.get('COURT_S3_REGION', DEFAULT_S3_REGION)
+        self._owns_conn = connection is None
+        self.conn = duckdb.connect() if connection is None else connection
+        # statement name -> True once prepared, None if it has no partitions
+        self._statements = {}
+        # Partition set version the statements were prepared against (see refresh)
+        self.version = None
+        if self._owns_conn:
+            configure_connection(self.conn, self.data_path, self.s3_region)
+
+    @property
+    def is_remote(self):
+        return self.data_path.startswith('s3://')
+
+    def partition_paths(self, years=None, court=None):
+        """Build globs that only touch the requested year/court partitions"""
+        court_part = f"court={court}" if court else "court=*"
+        if years:
+            return [f"{self.data_path}/year={int(y)}/{court_part}/bench=*/{PARTITION_FILE}" for y in years]
+        return [f"{self.data_path}/year=*/{court_part}/bench=*/{PARTITION_FILE}"]
+
+    def _has_files(self, pattern):
+        row = self.conn.execute("SELECT COUNT(*) FROM glob(?)", [pattern]).fetchone()
+        return bool(row and row[0])
+
+    def source(self, years=None, court=None):
+        """read_parquet() expression over the pruned partitions, or None if none exist"""
+        # read_parquet fails on a glob with no matches, so drop partitions
+        # that are missing (e.g. a year the court has no data for).
+        paths = [p for p in self.partition_paths(years, court) if self._has_files(p)]
+        if not paths:
+            return None
+        quoted = ', '.join(f"'{p}'" for p in paths)
+        return f"read_parquet([{quoted}], hive_partitioning=true, union_by_name=true)"
+
+    @staticmethod
+    def _where(years=None, court=None):
+        # Filters on the partition columns are pushed down as file filters too,
+        # so they also prune when a caller passes a wider glob.
+        clauses = []
+        if years:
+            clauses.append(f"year BETWEEN {int(min(years))} AND {int(max(years))}")
+        if court:
+            clauses.append(f"court = '{court}'")
+        return f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    def _prepare(self, name, build_sql, years=None, court=None):
+        """PREPARE a statement once per connection; partitions are listed here too"""
+        if name not in self._statements:
+            source = self.source(years=years, court=court)
+            if source is None:
+                self._statements[name] = None
+            else:
+                self.conn.execute(f"PREPARE {name} AS {build_sql(source)}")
+                self._statements[name] = True
+        return name if self._statements[name] else None
+
+    def _prepare_top_court(self, start_year, end_year):
+        years = range(int(start_year), int(end_year) + 1)
+        where = self._where(years=years)
+        return self._prepare(f"top_court_{int(start_year)}_{int(end_year)}", lambda source: f"""
+            SELECT court, COUNT(*) AS disposed
+            FROM {source}
+            {where}
+            GROUP BY court
+            ORDER BY disposed DESC, court
+            LIMIT 1
+        """, years=years)
+
+    def _prepare_delays(self, court):
+        where = self._where(court=court)
+        return self._prepare(f"delay_by_year_{court}", lambda source: f"""
+            WITH delays AS (
+                SELECT CAST(year AS INTEGER) AS year, {DELAY_DAYS_SQL} AS delay
+                FROM {source}
+                {where}
+            )
+            SELECT year, AVG(delay) AS mean_delay, COUNT(delay) AS cases,
+                   (SELECT regr_slope(delay, year) FROM delays WHERE delay IS NOT NULL) AS slope
+            FROM delays
+            WHERE delay IS NOT NULL
+            GROUP BY year
+            ORDER BY year
+        """, court=court)
+
+    def refresh(self, version):
+        """Re-prepare the statements if the partition set changed since they were prepared
+
+        A prepared statement keeps the partitions that existed when it was
+        prepared, so a new year or court would never be scanned. version is
+        the dataset fingerprint (court_summary.get_court_data_version). An
+        engine seen for the first time adopts it, as its statements were
+        prepared when it was created.
+        """
+        if self.version is not None and version != self.version:
+            logger.info(f"Court partitions changed ({self.version} -> {version}), re-preparing statements")
+            for name, prepared in self._statements.items():
+                if prepared:
+                    self.conn.execute(f"DEALLOCATE {name}")
+            # Prepared again on next use
+            self._statements.clear()
+        self.version = version
+
+    def prepare_standard(self):
+        """Prepare the statements for the standard court questions"""
+        self._prepare_top_court(*STANDARD_YEAR_RANGE)
+        self._prepare_delays(STANDARD_COURT)
+
+    def top_court_by_disposals(self, start_year, end_year):
+        """Court with the most decisions between start_year and end_year inclusive"""
+        name = self._prepare_top_court(start_year, end_year)
+        if name is None:
+            return None
+        row = self.conn.execute(f"EXECUTE {name}").fetchone()
+        logger.info(f"Top court {start_year}-{end_year}: {row}")
+        return row[0] if row else None
+
+    def delay_by_year(self, court):
+        """Mean registration-to-decision delay per year for one court"""
+        name = self._prepare_delays(court)
+        if name is None:
+            return pd.DataFrame(columns=['year', 'mean_delay', 'cases'])
+        return self.conn.execute(f"EXECUTE {name}").fetchdf()[['year', 'mean_delay', 'cases']]
+
+    def delay_regression_slope(self, court):
+        """Slope of the delay in days regressed on year for one court"""
+        name = self._prepare_delays(court)
+        if name is None:
+            return None
+        row = self.conn.execute(f"EXECUTE {name}").fetchone()
+        slope = row[3] if row else None
+        logger.info(f"Delay regression slope for court={court}: {slope}")
+        return None if slope is None or pd.isna(slope) else float(slope)
+
+    def close(self):
+        if self._owns_conn:
+            self.conn.close()
+
+
+class CourtConnectionPool:
+    """One DuckDB database per process, handing out cursors with prepared statements"""
+
+    def __init__(self, data_path=None, size=None, threads=None, memory_limit=None):
+        self.data_path = (data_path or os.environ.get('COURT_DATA_PATH', DEFAULT_COURT_DATA_PATH)).rstrip('/')
+        self.size = int(size or os.environ.get('DUCKDB_POOL_SIZE', 4))
+        threads = threads or os.environ.get('DUCKDB_THREADS')
+        memory_limit = memory_limit or os.environ.get('DUCKDB_MEMORY_LIMIT')
+        config = {}
+        if threads:
+            config['threads'] = int(threads)
+        if memory_limit:
+            config['memory_limit'] = memory_limit
+        self.conn = duckdb.connect(config=config)
+        configure_connection(self.conn, self.data_path, os.environ.get('COURT_S3_REGION', DEFAULT_S3_REGION))
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _new_engine(self):
+        engine = CourtQueryEngine(self.data_path, connection=self.conn.cursor())
+        try:
+            engine.prepare_standard()
+        except Exception as e:
+            logger.warning(f"Failed to prepare standard court queries: {e}")
+        return engine
+
+    @contextmanager
+    def engine(self):
+        """Check out a CourtQueryEngine bound to its own cursor"""
+        try:
+            engine = self._idle.get_nowait()
+        except queue.Empty:
+            engine = self._new_engine()
+        healthy = True
+        try:
+            yield engine
+        except Exception:
+            # A failed query can leave the cursor mid-transaction; don't reuse it
+            healthy = False
+            raise
+        finally:
+            with self._lock:
+                keep = healthy and not self._closed and self._idle.qsize() < self.size
+            if keep:
+                self._idle.put(engine)
+            else:
+                engine.conn.close()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().conn.close()
+            except queue.Empty:
+                break
+        self.conn.close()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_court_pool():
+    """Process-wide court pool, reopened in each forked gunicorn worker"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = CourtConnectionPool()
+            _pool_pid = os.getpid()
+            logger.info(f"Opened DuckDB court pool for {_pool.data_path}")
+        return _pool
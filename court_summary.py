@@ -0,0 +1,207 @@
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from court_engine import DELAY_DAYS_SQL, PARTITION_FILE, get_court_pool
+from file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'data-analyst-agent', 'court')
+
+
+class CourtSummary:
+    """Per court/bench/year aggregates that answer the court questions without a rescan"""
+
+    def __init__(self, frame, version):
+        self.frame = frame
+        self.version = version
+
+    def top_court_by_disposals(self, start_year, end_year):
+        """Court with the most decisions between start_year and end_year inclusive"""
+        rows = self.frame[self.frame['year'].between(int(start_year), int(end_year))]
+        if rows.empty:
+            return None
+        cases = rows.groupby('court')['cases'].sum()
+        # Ties go to the first court by name, as in CourtQueryEngine's ORDER BY
+        return cases[cases == cases.max()].index.min()
+
+    def delay_by_year(self, court):
+        """Mean registration-to-decision delay per year for one court"""
+        rows = self.frame[(self.frame['court'] == court) & (self.frame['delay_cases'] > 0)]
+        by_year = rows.groupby('year', as_index=False)[['delay_sum', 'delay_cases']].sum()
+        by_year['mean_delay'] = by_year['delay_sum'] / by_year['delay_cases']
+        by_year = by_year.rename(columns={'delay_cases': 'cases'})
+        return by_year[['year', 'mean_delay', 'cases']]
+
+    def delay_regression_slope(self, court):
+        """Least-squares slope of delay on year, from the per-year sums"""
+        rows = self.frame[(self.frame['court'] == court) & (self.frame['delay_cases'] > 0)]
+        n = rows['delay_cases'].sum()
+        if n < 2:
+            return None
+        year = rows['year'].astype(float)
+        # Centering on the mean year keeps the sums well conditioned:
+        # sum((x - mean_x) * y) over cases == sum((year - mean_x) * delay_sum)
+        mean_year = (year * rows['delay_cases']).sum() / n
+        centered = year - mean_year
+        variance = (rows['delay_cases'] * centered ** 2).sum()
+        if variance == 0:
+            return None
+        return float((centered * rows['delay_sum']).sum() / variance)
+
+
+def summary_enabled():
+    """COURT_SUMMARY=0 answers every court question from the partitions"""
+    return os.environ.get('COURT_SUMMARY', '1') != '0'
+
+
+class CourtSummaryCache:
+    """Build the summary once per dataset version and keep it as a local Parquet file
+
+    Listing the dataset and building the summary both scan it, so they run on
+    a background thread (start()) every COURT_VERSION_TTL seconds rather than
+    in requests. Requests only read what the last refresh found: version() is
+    None before the first one, and summary() is None until the summary of the
+    current version is built, so requests query the partitions meanwhile.
+    """
+
+    def __init__(self, cache_dir=None, version_ttl=None):
+        self.cache_dir = cache_dir or os.environ.get('COURT_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.version_ttl = float(version_ttl if version_ttl is not None else os.environ.get('COURT_VERSION_TTL', 300))
+        self._lock = threading.Lock()
+        self._summary = None
+        self._version = None
+        self._thread = None
+        self._thread_pid = None
+        self._stop = threading.Event()
+
+    def dataset_version(self, engine):
+        """Fingerprint of the partition files; COURT_DATA_VERSION overrides it"""
+        pinned = os.environ.get('COURT_DATA_VERSION')
+        if pinned:
+            return pinned
+        digest = hashlib.sha256(engine.data_path.encode())
+        if engine.is_remote:
+            # One listing of the bucket; new partitions change the version
+            files = engine.conn.execute("SELECT file FROM glob(?) ORDER BY file", engine.partition_paths()[:1]).fetchall()
+            for (name,) in files:
+                digest.update(name.encode())
+        else:
+            for root, dirs, files in os.walk(engine.data_path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name != PARTITION_FILE:
+                        continue
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    digest.update(f"{os.path.relpath(path, engine.data_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()[:16]
+
+    def summary_path(self, version):
+        return os.path.join(self.cache_dir, f"summary-{version}.parquet")
+
+    def build(self, engine, path):
+        """Scan the full dataset once and write the aggregates to path"""
+        source = engine.source()
+        if source is None:
+            raise ValueError(f"No court partitions under {engine.data_path}")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        started = time.time()
+        engine.conn.execute(f"""
+            COPY (
+                SELECT court, bench, year,
+                       COUNT(*) AS cases,
+                       COUNT(delay) AS delay_cases,
+                       SUM(delay) AS delay_sum,
+                       SUM(delay * delay) AS delay_sq_sum,
+                       MIN(delay) AS delay_min,
+                       MAX(delay) AS delay_max
+                FROM (
+                    SELECT CAST(court AS VARCHAR) AS court, CAST(bench AS VARCHAR) AS bench,
+                           CAST(year AS INTEGER) AS year, CAST({DELAY_DAYS_SQL} AS DOUBLE) AS delay
+                    FROM {source}
+                )
+                GROUP BY court, bench, year
+                ORDER BY court, bench, year
+            ) TO '{tmp_path}' (FORMAT PARQUET)
+        """)
+        os.replace(tmp_path, path)
+        logger.info(f"Built court summary {path} in {time.time() - started:.2f}s")
+
+    def refresh(self, engine):
+        """Check the dataset version and load or build its summary; returns the version"""
+        version = self.dataset_version(engine)
+        with self._lock:
+            if version != self._version:
+                logger.info(f"Court dataset version {version}")
+            self._version = version
+            if not summary_enabled() or (self._summary is not None and self._summary.version == version):
+                return version
+        path = self.summary_path(version)
+        if not os.path.exists(path):
+            # Only one worker scans the dataset; the rest wait and then read its file
+            with file_lock(f"{path}.lock"):
+                if not os.path.exists(path):
+                    self.build(engine, path)
+        frame = engine.conn.execute("SELECT * FROM read_parquet(?)", [path]).fetchdf()
+        with self._lock:
+            self._summary = CourtSummary(frame, version)
+        return version
+
+    def version(self):
+        """Dataset version found by the last refresh, or None before the first one"""
+        return os.environ.get('COURT_DATA_VERSION') or self._version
+
+    def summary(self):
+        """Summary of the current dataset version, or None while it is being built"""
+        with self._lock:
+            if summary_enabled() and self._summary is not None and self._summary.version == self._version:
+                return self._summary
+        return None
+
+    def start(self):
+        """Start this process's refresh thread, once (again after a fork)"""
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._loop, name='court-refresh', daemon=True)
+            self._thread_pid = os.getpid()
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                with get_court_pool().engine() as engine:
+                    self.refresh(engine)
+            except Exception as e:
+                logger.warning(f"Court summary refresh failed: {e}")
+            self._stop.wait(max(self.version_ttl, 1))
+
+    def close(self):
+        """Stop the refresh thread"""
+        self._stop.set()
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join()
+
+
+_summary_cache = CourtSummaryCache()
+
+
+def start_court_refresher():
+    """Keep the process-wide dataset version and summary current in the background"""
+    _summary_cache.start()
+
+
+def get_court_summary():
+    """Summary from the process-wide cache, or None until it is built"""
+    _summary_cache.start()
+    return _summary_cache.summary()
+
+
+def get_court_data_version():
+    """Dataset version from the process-wide cache, or None until it is known"""
+    _summary_cache.start()
+    return _summary_cache.version()
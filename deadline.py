@@ -0,0 +1,146 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+
+HEADER = 'X-Deadline-Ms'
+
+# Shortest network timeout handed out, so a nearly spent budget still fails fast rather than blocking
+MIN_TIMEOUT = 0.01
+
+# How long past the deadline a worker process has to send back its partial answers
+REPLY_GRACE = 1.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before this step finished"""
+
+
+class Deadline:
+    """The time.monotonic() by which a request's answers are due
+
+    monotonic() is system-wide on Linux, so expires_at can be handed to a
+    worker process (see restore()).
+    """
+
+    def __init__(self, expires_at):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds):
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+_current = contextvars.ContextVar('deadline', default=None)
+
+
+def max_deadline_ms():
+    """Longest budget a client may ask for; below gunicorn's 300 s timeout so answers can still go out"""
+    return float(os.environ.get('DEADLINE_MAX_MS', 280000))
+
+
+def from_header(value):
+    """Deadline for an X-Deadline-Ms value, else DEFAULT_DEADLINE_MS, else None
+
+    Raises ValueError for anything but a positive number of milliseconds.
+    """
+    value = value or os.environ.get('DEFAULT_DEADLINE_MS')
+    if not value:
+        return None
+    ms = float(value)
+    if not ms > 0:
+        raise ValueError(f"{HEADER} must be a positive number of milliseconds")
+    return Deadline.after(min(ms, max_deadline_ms()) / 1000)
+
+
+@contextmanager
+def scope(deadline):
+    """Make deadline the current one in this context; copies of it (executors, plans) see it too"""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def restore(expires_at):
+    """Scope for a deadline passed to a worker process as expires_at; a no-op for None"""
+    return scope(Deadline(expires_at)) if expires_at is not None else nullcontext()
+
+
+def current():
+    return _current.get()
+
+
+def expires_at():
+    deadline = current()
+    return None if deadline is None else deadline.expires_at
+
+
+def remaining():
+    """Seconds left in the current budget, or None without a deadline"""
+    deadline = current()
+    return None if deadline is None else deadline.remaining()
+
+
+def expired():
+    deadline = current()
+    return deadline is not None and deadline.expired()
+
+
+def timeout(default, share=1.0):
+    """default, or share of the remaining budget if that is shorter
+
+    A share below 1 keeps time back for what comes after, such as the
+    fallback to a stale copy when the fetch times out.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    return max(MIN_TIMEOUT, min(default, left * share))
+
+
+def low():
+    """True when less than DEADLINE_LOW_MS (default 2000) remain"""
+    left = remaining()
+    return left is not None and left * 1000 < float(os.environ.get('DEADLINE_LOW_MS', 2000))
+
+
+def plot_dpi(dpi):
+    """dpi, lowered to DEADLINE_PLOT_DPI (default 50) when the budget is low"""
+    if low():
+        return min(dpi, int(os.environ.get('DEADLINE_PLOT_DPI', 50)))
+    return dpi
+
+
+@contextmanager
+def interrupting(conn):
+    """Interrupt the DuckDB query running on conn once the deadline passes
+
+    The interrupted query raises DeadlineExceeded. Without a deadline or a
+    connection (e.g. a court summary frame) this does nothing.
+    """
+    left = remaining()
+    timer = None
+    if left is not None and conn is not None:
+        if left <= 0:
+            raise DeadlineExceeded("Deadline passed before the query started")
+        timer = threading.Timer(left, conn.interrupt)
+        timer.daemon = True
+        timer.start()
+    try:
+        yield
+    except Exception as e:
+        if timer is not None and expired():
+            raise DeadlineExceeded("Query interrupted at the deadline") from e
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
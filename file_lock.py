@@ -0,0 +1,58 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines (install_dependencies.bat)
+    fcntl = None
+
+
+LOCK_POLL_INTERVAL = 0.05
+
+
+class LockTimeout(TimeoutError):
+    """file_lock() gave up waiting for another holder"""
+
+
+def _acquire(handle, operation, timeout):
+    if timeout is None:
+        fcntl.flock(handle.fileno(), operation)
+        return
+    give_up = time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(handle.fileno(), operation | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            if time.monotonic() >= give_up:
+                raise LockTimeout(f"{handle.name} still locked after {timeout:g}s") from None
+            time.sleep(LOCK_POLL_INTERVAL)
+
+
+@contextmanager
+def file_lock(path, shared=False, timeout=None):
+    """Advisory lock on path, shared by every gunicorn worker on the host
+
+    With a timeout, raises LockTimeout if the lock is still held elsewhere
+    after that many seconds.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as handle:
+        if fcntl is not None:
+            _acquire(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX, timeout)
+        try:
+            yield handle
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write(path, data):
+    """Write bytes to path so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,9 @@
+# Read automatically by gunicorn from the working directory
+
+
+def post_worker_init(worker):
+    """Import the analysis stack, run queued jobs and refresh the court summary in the background once serving"""
+    from app import prewarm_in_background, start_court_refresher, start_job_runner
+    prewarm_in_background()
+    start_job_runner()
+    start_court_refresher()
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import requests
+from file_lock import file_lock, atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'data-analyst-agent', 'http')
+
+
+class CachedResponse:
+    """Body of a cached URL plus how it was obtained"""
+
+    def __init__(self, url, content, meta, from_cache, revalidated=False, stale=False):
+        self.url = url
+        self.content = content
+        self.etag = meta.get('etag')
+        self.last_modified = meta.get('last_modified')
+        self.fetched_at = meta.get('fetched_at')
+        self.from_cache = from_cache
+        self.revalidated = revalidated
+        self.stale = stale
+
+    @property
+    def version(self):
+        """Validator identifying this copy of the resource"""
+        return self.etag or self.last_modified or str(self.fetched_at)
+
+
+class HttpCache:
+    """On-disk GET cache keyed by URL, shared by all workers through the filesystem
+
+    Entries younger than the TTL are served without touching the network. Older
+    ones are revalidated with If-None-Match/If-Modified-Since. The total size is
+    kept under max_bytes by evicting the least recently used entries.
+    """
+
+    def __init__(self, cache_dir=None, ttl=None, max_bytes=None, session=None):
+        self.cache_dir = cache_dir or os.environ.get('HTTP_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.ttl = float(ttl if ttl is not None else os.environ.get('HTTP_CACHE_TTL', 3600))
+        self.max_bytes = int(max_bytes if max_bytes is not None else os.environ.get('HTTP_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+        self.session = session or requests.Session()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.body", f"{base}.json", f"{base}.lock"
+
+    def _load_meta(self, url):
+        try:
+            with open(self._paths(url)[1]) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('url') == url else None
+
+    def _load(self, url):
+        body_path, _, _ = self._paths(url)
+        meta = self._load_meta(url)
+        if meta is None:
+            return None, None
+        try:
+            with open(body_path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None, None
+        # The body's mtime doubles as the LRU access time
+        try:
+            os.utime(body_path)
+        except OSError:
+            pass
+        return meta, content
+
+    def _is_fresh(self, meta):
+        return time.time() - meta.get('fetched_at', 0) < self.ttl
+
+    def _store(self, url, content, meta):
+        body_path, meta_path, _ = self._paths(url)
+        atomic_write(body_path, content)
+        atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with file_lock(os.path.join(self.cache_dir, '.evict.lock')):
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.body'):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            entries.sort()
+            while total > self.max_bytes and entries:
+                _, size, path = entries.pop(0)
+                for stale_path in (path, path[:-len('.body')] + '.json'):
+                    try:
+                        os.unlink(stale_path)
+                    except OSError:
+                        pass
+                total -= size
+                logger.info(f"Evicted {path} from HTTP cache")
+
+    def conditional_headers(self, meta, headers=None):
+        """Request headers plus the validators of the cached copy, if any"""
+        request_headers = dict(headers or {})
+        if meta is not None:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+        return request_headers
+
+    def record_not_modified(self, url, content, meta):
+        """Mark the cached copy fresh again after a 304"""
+        meta['fetched_at'] = time.time()
+        atomic_write(self._paths(url)[1], json.dumps(meta).encode('utf-8'))
+        logger.info(f"Revalidated {url} (304)")
+        return CachedResponse(url, content, meta, from_cache=True, revalidated=True)
+
+    def record_response(self, url, content, response_headers):
+        """Store a freshly downloaded body"""
+        meta = {
+            'url': url,
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'size': len(content),
+        }
+        self._store(url, content, meta)
+        logger.info(f"Fetched {url} ({len(content)} bytes)")
+        return CachedResponse(url, content, meta, from_cache=False)
+
+    def fresh_copy(self, url):
+        """(CachedResponse or None, meta, content): the cached copy if it is still fresh"""
+        meta, content = self._load(url)
+        if meta is not None and self._is_fresh(meta):
+            return CachedResponse(url, content, meta, from_cache=True), meta, content
+        return None, meta, content
+
+    def fetch_lock(self, url, timeout=None):
+        """The per-URL file lock held while fetching, so one worker on the host fetches url at a time"""
+        return file_lock(self._paths(url)[2], timeout=timeout)
+
+    def get(self, url, timeout=30, headers=None):
+        """Fetch url through the cache and return a CachedResponse"""
+        cached, _, _ = self.fresh_copy(url)
+        if cached is not None:
+            return cached
+
+        with self.fetch_lock(url):
+            # Another worker may have refreshed the entry while we waited
+            cached, meta, content = self.fresh_copy(url)
+            if cached is not None:
+                return cached
+
+            try:
+                response = self.session.get(url, timeout=timeout, headers=self.conditional_headers(meta, headers))
+                if response.status_code == 304 and meta is not None:
+                    return self.record_not_modified(url, content, meta)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                if meta is None:
+                    raise
+                logger.warning(f"Fetch of {url} failed, serving stale copy: {e}")
+                return CachedResponse(url, content, meta, from_cache=True, stale=True)
+
+            return self.record_response(url, response.content, response.headers)
+
+    def version(self, url, timeout=30, headers=None):
+        """Validator of the current copy of url, read from the metadata alone while it is fresh"""
+        meta = self._load_meta(url)
+        if meta is not None and self._is_fresh(meta):
+            return CachedResponse(url, None, meta, from_cache=True).version
+        return self.get(url, timeout=timeout, headers=headers).version
+
+
+_http_cache = None
+
+
+def get_http_cache():
+    """Process-wide cache; all instances share the same directory"""
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = HttpCache()
+    return _http_cache
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import tempfile
+import threading
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), 'data-analyst-agent', 'jobs.sqlite3')
+
+# Lower runs first
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+PRIORITY_NAMES = {level: name for name, level in PRIORITIES.items()}
+
+# How often the scheduler requeues jobs whose lease expired and prunes old ones
+RECOVER_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    questions TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker TEXT,
+    heartbeat_at REAL,
+    cache_status TEXT,
+    result BLOB,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at);
+"""
+
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """Analysis jobs persisted in SQLite, so every worker on the host shares one queue
+
+    Jobs are claimed in priority order, then oldest first. A claim only succeeds
+    while fewer than max_concurrency jobs are running across all processes
+    using the database. A claim is a lease: the claiming scheduler renews
+    heartbeat_at while the job runs, and recover() requeues a running job
+    whose heartbeat is older than lease seconds, whichever host ran it.
+    """
+
+    def __init__(self, db_path=None, max_concurrency=None, retention=None, lease=None):
+        self.db_path = db_path or os.environ.get('JOBS_DB', DEFAULT_DB_PATH)
+        self.max_concurrency = int(max_concurrency or os.environ.get('JOBS_MAX_CONCURRENCY', 2))
+        self.retention = float(retention if retention is not None else os.environ.get('JOBS_RETENTION', 86400))
+        self.lease = float(lease if lease is not None else os.environ.get('JOBS_LEASE', 60))
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'heartbeat_at' not in columns:
+                # A database from before leases
+                try:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+                except sqlite3.OperationalError as e:
+                    logger.info(f"heartbeat_at column already added by another worker: {e}")
+
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across threads
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, questions_text, priority='normal'):
+        """Queue questions and return the new job id"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}; use one of {', '.join(PRIORITIES)}")
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, priority, questions, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, PRIORITIES[priority], questions_text, time.time()),
+            )
+        return job_id
+
+    def claim(self):
+        """Mark the next queued job as running and return (id, questions), or None"""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+                if running >= self.max_concurrency:
+                    conn.execute("COMMIT")
+                    return None
+                row = conn.execute(
+                    "SELECT id, questions FROM jobs WHERE status = 'queued' ORDER BY priority, created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, worker = ? WHERE id = ?",
+                        (now, now, _worker_id(), row['id']),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return (row['id'], row['questions']) if row is not None else None
+
+    def heartbeat(self, job_ids):
+        """Renew the lease of running jobs"""
+        if not job_ids:
+            return
+        job_ids = list(job_ids)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND id IN ({', '.join('?' * len(job_ids))})",
+                (time.time(), *job_ids),
+            )
+
+    def finish(self, job_id, body, cache_status):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, result = ?, cache_status = ? WHERE id = ?",
+                (time.time(), body, cache_status, job_id),
+            )
+
+    def fail(self, job_id, error):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                (time.time(), str(error), job_id),
+            )
+
+    def get(self, job_id):
+        """Job row as a dict (result as bytes), or None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job['status'] == 'queued':
+                job['position'] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+                    "(priority < ? OR (priority = ? AND created_at < ?))",
+                    (job['priority'], job['priority'], job['created_at']),
+                ).fetchone()[0]
+        return job
+
+    def recover(self):
+        """Requeue running jobs whose lease expired, and drop expired finished jobs"""
+        expired = time.time() - self.lease
+        with closing(self._connect()) as conn:
+            for row in conn.execute("SELECT id, worker FROM jobs WHERE status = 'running' "
+                                    "AND (heartbeat_at IS NULL OR heartbeat_at < ?)", (expired,)).fetchall():
+                conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL, heartbeat_at = NULL, worker = NULL "
+                             "WHERE id = ? AND status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                             (row['id'], expired))
+                logger.warning(f"Requeued job {row['id']} from worker {row['worker']}, its lease expired")
+            conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                         (time.time() - self.retention,))
+
+
+class JobScheduler:
+    """Background thread that claims jobs and runs them with run_job(questions) -> (body, cache status)"""
+
+    def __init__(self, queue, run_job, poll_interval=None):
+        self.queue = queue
+        self.run_job = run_job
+        self.poll_interval = float(poll_interval or os.environ.get('JOBS_POLL_INTERVAL', 1.0))
+        self._executor = ThreadPoolExecutor(max_workers=queue.max_concurrency, thread_name_prefix='job')
+        # Claimed jobs whose lease this scheduler renews
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='job-scheduler', daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        """Look for work now rather than at the next poll"""
+        self._wake.set()
+
+    def _loop(self):
+        last_recover = 0.0
+        last_heartbeat = time.time()
+        while not self._stop.is_set():
+            # Renewed well within the lease, so a slow heartbeat is not taken for a dead worker
+            if time.time() - last_heartbeat > self.queue.lease / 3:
+                with self._running_lock:
+                    running = list(self._running)
+                try:
+                    self.queue.heartbeat(running)
+                except Exception as e:
+                    logger.error(f"Failed to renew job leases: {e}")
+                last_heartbeat = time.time()
+            if time.time() - last_recover > RECOVER_INTERVAL:
+                try:
+                    self.queue.recover()
+                except Exception as e:
+                    logger.error(f"Failed to recover jobs: {e}")
+                last_recover = time.time()
+            claimed = None
+            try:
+                claimed = self.queue.claim()
+            except Exception as e:
+                logger.error(f"Failed to claim a job: {e}")
+            if claimed is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            with self._running_lock:
+                self._running.add(claimed[0])
+            self._executor.submit(self._run, *claimed)
+
+    def _run(self, job_id, questions_text):
+        started = time.time()
+        try:
+            body, cache_status = self.run_job(questions_text)
+            self.queue.finish(job_id, body, cache_status)
+            logger.info(f"Job {job_id} done in {time.time() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self.queue.fail(job_id, e)
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
+            # A slot is free; another job may be waiting
+            self.wake()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+
+def describe_job(job):
+    """Public view of a job row: status, timings and the answers once done"""
+    view = {
+        'id': job['id'],
+        'status': job['status'],
+        'priority': PRIORITY_NAMES.get(job['priority'], job['priority']),
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+    }
+    if 'position' in job:
+        view['position'] = job['position']
+    if job['status'] == 'done':
+        view['cache'] = job['cache_status']
+        view['result'] = json.loads(job['result'])
+    elif job['status'] == 'failed':
+        view['error'] = job['error']
+    return view
+
+
+_job_queue = None
+_scheduler = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Process-wide handle on the shared job database"""
+    global _job_queue
+    with _scheduler_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
+
+
+def start_job_scheduler(run_job):
+    """This process's scheduler, started on first call (again after a fork)"""
+    global _scheduler, _scheduler_pid
+    queue = get_job_queue()
+    with _scheduler_lock:
+        if _scheduler is None or _scheduler_pid != os.getpid():
+            _scheduler = JobScheduler(queue, run_job)
+            _scheduler_pid = os.getpid()
+            logger.info(f"Started job scheduler on {queue.db_path} (max {queue.max_concurrency} running)")
+        return _scheduler
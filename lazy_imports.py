@@ -0,0 +1,103 @@
+import os
+import time
+import logging
+import importlib
+import threading
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_registry = []
+
+
+def lazy_enabled():
+    """LAZY_IMPORTS=0 restores eager imports at startup"""
+    return os.environ.get('LAZY_IMPORTS', '1') != '0'
+
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access
+
+    on_import(module) runs once, right after the import, e.g. to apply
+    matplotlib styling that the module's users rely on.
+    """
+
+    def __init__(self, name, on_import=None):
+        self.__dict__['_name'] = name
+        self.__dict__['_on_import'] = on_import
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is not None:
+            return module
+        with _lock:
+            module = self.__dict__['_module']
+            if module is None:
+                started = time.perf_counter()
+                module = importlib.import_module(self._name)
+                if self._on_import is not None:
+                    self._on_import(module)
+                logger.info(f"Imported {self._name} in {(time.perf_counter() - started) * 1000:.0f} ms")
+                self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        # Lets tests monkeypatch attributes of the real module through the proxy
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name, on_import=None):
+    """Proxy for name, or the module itself, imported now, when lazy imports are off"""
+    module = LazyModule(name, on_import)
+    with _lock:
+        _registry.append(module)
+    if not lazy_enabled():
+        module._load()
+    return module
+
+
+def prewarm(modules=None, extra=None):
+    """Import the given (default: all registered) lazy modules, then call extra()"""
+    with _lock:
+        modules = list(_registry if modules is None else modules)
+    started = time.perf_counter()
+    for module in modules:
+        try:
+            module._load()
+        except Exception as e:
+            logger.warning(f"Pre-warm import of {module._name} failed: {e}")
+    if extra is not None:
+        try:
+            extra()
+        except Exception as e:
+            logger.warning(f"Pre-warm step failed: {e}")
+    logger.info(f"Pre-warmed {len(modules)} modules in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+def start_prewarm(modules=None, extra=None):
+    """Run prewarm() in a daemon thread when lazy imports are on and PREWARM is not 0"""
+    if not lazy_enabled() or os.environ.get('PREWARM', '1') == '0':
+        return None
+    thread = threading.Thread(target=prewarm, args=(modules, extra), name='prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+def report_import_time(module_name, started):
+    """Log how long module_name took to import against IMPORT_BUDGET_MS; returns milliseconds"""
+    elapsed = (time.perf_counter() - started) * 1000
+    budget = float(os.environ.get('IMPORT_BUDGET_MS', 500))
+    mode = 'lazy' if lazy_enabled() else 'eager'
+    if elapsed > budget:
+        logger.warning(f"{module_name} imported in {elapsed:.0f} ms ({mode}), over the {budget:.0f} ms budget")
+    else:
+        logger.info(f"{module_name} imported in {elapsed:.0f} ms ({mode}), budget {budget:.0f} ms")
+    return elapsed
@@ -0,0 +1,160 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_registry = []
+
+# Spans finished in the current request (or job), for the Server-Timing header
+_collector = contextvars.ContextVar('span_collector', default=None)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative buckets, sum and count per label set, in Prometheus' layout"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets, values):
+                labels = _format_labels(self.labelnames, key, {'le': _format_value(bound)})
+                yield f"{self.name}_bucket{labels} {count}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': '+Inf'})} {values[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {values[-2]!r}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {values[-1]}"
+
+
+STAGE_SECONDS = Histogram('analysis_stage_seconds', 'Time spent in each analysis stage', ['stage'])
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP request latency', ['method', 'route', 'status'])
+RESPONSES = Counter('api_responses', 'Analysis responses served, by X-Cache status', ['cache'])
+
+
+@contextmanager
+def span(stage):
+    """Time the block as one stage: observed in STAGE_SECONDS and kept for Server-Timing"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_spans([(stage, time.perf_counter() - started)])
+
+
+def record_spans(spans):
+    """Observe finished (stage, seconds) spans, e.g. ones measured in a worker process"""
+    collected = _collector.get()
+    for stage, seconds in spans:
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        if collected is not None:
+            collected.append((stage, seconds))
+
+
+def track_spans():
+    """Start a fresh span list for the current context (a request) and return it"""
+    spans = []
+    _collector.set(spans)
+    return spans
+
+
+@contextmanager
+def collect_spans():
+    """Gather the spans finished inside the block into the yielded list
+
+    They are also passed on to any enclosing collect_spans() block.
+    """
+    outer = _collector.get()
+    spans = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+        if outer is not None:
+            outer.extend(spans)
+
+
+def server_timing(spans):
+    """Server-Timing header value, one entry per stage with repeats summed"""
+    totals = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ', '.join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+def server_timing_enabled():
+    return os.environ.get('SERVER_TIMING', '0') == '1'
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        name = f"{metric.name}_total" if metric.kind == 'counter' else metric.name
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
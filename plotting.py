@@ -0,0 +1,308 @@
+import io
+import os
+import queue
+import base64
+import logging
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image, features
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+MAX_IMAGE_BYTES = 100000
+
+# Settings tried at full resolution, from best looking to smallest
+PNG_LADDER = ({}, {'colors': 256}, {'colors': 64}, {'colors': 16})
+WEBP_QUALITY_RANGE = (30, 90)
+MIN_SCALE = 0.3
+
+_local = threading.local()
+
+EncodedImage = namedtuple('EncodedImage', 'data_uri fmt dpi quality colors nbytes passes')
+
+
+def _buffer():
+    """Per-thread BytesIO reused across renders, so its allocation is kept"""
+    buf = getattr(_local, 'buffer', None)
+    if buf is None:
+        buf = _local.buffer = io.BytesIO()
+    buf.seek(0)
+    buf.truncate()
+    return buf
+
+
+def render_figure(fig, fmt='png', dpi=100, **savefig_kwargs):
+    """Render fig into the thread's buffer and return (buffer, size in bytes)"""
+    buf = _buffer()
+    fig.savefig(buf, format=fmt, dpi=dpi, **savefig_kwargs)
+    return buf, buf.tell()
+
+
+def to_data_uri(buf, fmt='png'):
+    """Base64 data URI straight from the buffer's memory, without copying it to bytes first"""
+    with buf.getbuffer() as view:
+        encoded = base64.b64encode(view)
+    return f"data:image/{fmt};base64,{encoded.decode('ascii')}"
+
+
+def empty_data_uri(fmt='png'):
+    return f"data:image/{fmt};base64,"
+
+
+def byte_budget(max_chars, fmt):
+    """Largest image that still fits in a data URI of max_chars characters"""
+    prefix = len(empty_data_uri(fmt))
+    return max(0, (max_chars - prefix - 1) // 4 * 3)
+
+
+class _Search:
+    """Encode one raster with different settings, counting the passes"""
+
+    def __init__(self, image, fmt, budget):
+        self.image = image
+        self.fmt = fmt
+        self.budget = budget
+        self.passes = 0
+        self.best = None  # (settings, encoded bytes) of the last encode that fit
+        self._scaled = {1.0: image}
+
+    def scaled(self, scale):
+        if scale not in self._scaled:
+            size = (max(1, round(self.image.width * scale)), max(1, round(self.image.height * scale)))
+            self._scaled[scale] = self.image.resize(size, Image.LANCZOS)
+        return self._scaled[scale]
+
+    def encode(self, scale=1.0, quality=None, colors=None):
+        """Encode into the thread buffer and return its size"""
+        image = self.scaled(scale)
+        buf = _buffer()
+        if self.fmt == 'webp':
+            image.save(buf, 'WEBP', quality=quality, method=4)
+        else:
+            if colors:
+                image = image.quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+            image.save(buf, 'PNG', compress_level=6)
+        self.passes += 1
+        return buf.tell()
+
+    def fits(self, scale=1.0, quality=None, colors=None):
+        if self.encode(scale, quality, colors) > self.budget:
+            return False
+        settings = {'scale': scale, 'quality': quality, 'colors': colors}
+        self.best = (settings, _local.buffer.getvalue())
+        return True
+
+
+def _search_quality(search, scale):
+    """Highest WebP quality that fits at this scale, or None"""
+    low, high = WEBP_QUALITY_RANGE
+    if search.fits(scale=scale, quality=high):
+        return high
+    if not search.fits(scale=scale, quality=low):
+        return None
+    best = low
+    while high - low > 5:
+        mid = (low + high) // 2
+        if search.fits(scale=scale, quality=mid):
+            best = low = mid
+        else:
+            high = mid
+    return best
+
+
+def _search_scale(search, fits_at):
+    """Largest scale in [MIN_SCALE, 1) for which fits_at(scale) holds, by bisection"""
+    low, high = MIN_SCALE, 1.0
+    if not fits_at(low):
+        return low
+    best = low
+    for _ in range(5):
+        mid = round((low + high) / 2, 3)
+        if fits_at(mid):
+            best = low = mid
+        else:
+            high = mid
+    return best
+
+
+def encode_to_budget(fig, fmt='png', max_chars=MAX_IMAGE_BYTES, dpi=100, **savefig_kwargs):
+    """Encode fig as a data URI of at most max_chars characters, drawing it only once
+
+    The figure is rendered a single time at dpi. If that PNG is too large,
+    the raster is re-encoded with Pillow. It tries palette quantization (PNG) or a
+    WebP quality search first, then shrinks the resolution by bisection.
+    Returns an EncodedImage describing the settings that were used.
+    """
+    if fmt == 'webp' and not features.check('webp'):
+        logger.warning("Pillow was built without WebP support, encoding PNG instead")
+        fmt = 'png'
+    budget = byte_budget(max_chars, fmt)
+
+    with span('plot.draw'):
+        buf, size = render_figure(fig, 'png', dpi=dpi, **savefig_kwargs)
+    with span('plot.encode'):
+        return _encode_raster(buf, size, fmt, budget, dpi)
+
+
+def _encode_raster(buf, size, fmt, budget, dpi):
+    """The rendered PNG in buf as an EncodedImage within budget bytes"""
+    if fmt == 'png' and size <= budget:
+        return EncodedImage(to_data_uri(buf, 'png'), 'png', dpi, None, None, size, 1)
+
+    buf.seek(0)
+    source = Image.open(buf)
+    source.load()
+    search = _Search(source.convert('RGB'), fmt, budget)
+    search.passes = 1
+
+    quality = colors = None
+    scale = 1.0
+    if fmt == 'webp':
+        quality = _search_quality(search, 1.0)
+        if quality is None:
+            quality = WEBP_QUALITY_RANGE[0]
+            scale = _search_scale(search, lambda s: search.fits(scale=s, quality=quality))
+    else:
+        for settings in PNG_LADDER[1:]:
+            if search.fits(**settings):
+                colors = settings['colors']
+                break
+        else:
+            colors = PNG_LADDER[-1]['colors']
+            scale = _search_scale(search, lambda s: search.fits(scale=s, colors=colors))
+
+    settings = {'scale': scale, 'quality': quality, 'colors': colors}
+    if search.best is not None and search.best[0] == settings:
+        data = search.best[1]
+    else:
+        # Nothing fit: settle for the smallest settings tried
+        search.encode(**settings)
+        data = _local.buffer.getvalue()
+        logger.warning(f"Image still over budget at the smallest settings: {len(data)} > {budget} bytes")
+    data_uri = f"data:image/{fmt};base64,{base64.b64encode(data).decode('ascii')}"
+    return EncodedImage(data_uri, fmt, round(dpi * scale), quality, colors, len(data), search.passes)
+
+
+ScatterStyle = namedtuple('ScatterStyle', 'point_color point_size alpha line_color line_style label_size title_size title_weight')
+
+# create_scatterplot_with_regression in app.py
+REGRESSION_STYLE = ScatterStyle(None, 50, 0.6, 'red', '--', None, None, None)
+
+
+class ScatterTemplate:
+    """A styled Figure with one scatter and one line artist, updated in place per plot
+
+    Uses the object-oriented Figure/FigureCanvasAgg API, so nothing touches
+    pyplot's global state and templates can be drawn from several threads.
+    """
+
+    def __init__(self, style, figsize=(10, 6), dpi=100):
+        self.style = style
+        self.figure = Figure(figsize=figsize, dpi=dpi, layout='tight')
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        scatter_kwargs = {'alpha': style.alpha, 's': style.point_size}
+        if style.point_color:
+            scatter_kwargs['color'] = style.point_color
+        self.scatter = self.ax.scatter([], [], **scatter_kwargs)
+        self.line, = self.ax.plot([], [], color=style.line_color, linestyle=style.line_style, linewidth=2)
+        self.ax.grid(True, alpha=0.3)
+        self.legend = None
+
+    def update(self, x, y, x_label, y_label, title, line=None, line_label=None):
+        """Point the artists at new data and labels"""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        points = np.column_stack([x, y]) if len(x) else np.empty((0, 2))
+        self.scatter.set_offsets(points)
+
+        if line is not None:
+            self.line.set_data(*line)
+        self.line.set_visible(line is not None)
+
+        # relim() ignores collections, so rebuild the data limits from the points
+        self.ax.dataLim.set_points(np.array([[np.inf, np.inf], [-np.inf, -np.inf]]))
+        self.ax.ignore_existing_data_limits = True
+        if len(points):
+            self.ax.update_datalim(points)
+        if line is not None and len(line[0]):
+            self.ax.update_datalim(np.column_stack(line))
+        self.ax.autoscale_view()
+
+        label_kwargs = {'fontsize': self.style.label_size} if self.style.label_size else {}
+        self.ax.set_xlabel(x_label, **label_kwargs)
+        self.ax.set_ylabel(y_label, **label_kwargs)
+        title_kwargs = {}
+        if self.style.title_size:
+            title_kwargs['fontsize'] = self.style.title_size
+        if self.style.title_weight:
+            title_kwargs['fontweight'] = self.style.title_weight
+        self.ax.set_title(title, **title_kwargs)
+
+        if line is not None and line_label:
+            self.line.set_label(line_label)
+            if self.legend is None:
+                self.legend = self.ax.legend()
+            else:
+                self.legend.get_texts()[0].set_text(line_label)
+            self.legend.set_visible(True)
+        elif self.legend is not None:
+            self.legend.set_visible(False)
+
+
+class PlotService:
+    """Pools of pre-styled scatter templates, one pool per style"""
+
+    def __init__(self, pool_size=None):
+        self.pool_size = int(pool_size or os.environ.get('PLOT_POOL_SIZE', 4))
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, style):
+        with self._lock:
+            if style not in self._pools:
+                self._pools[style] = queue.LifoQueue()
+            return self._pools[style]
+
+    @contextmanager
+    def template(self, style=REGRESSION_STYLE):
+        """Check out a template for style, building one if the pool is empty"""
+        pool = self._pool(style)
+        try:
+            template = pool.get_nowait()
+        except queue.Empty:
+            template = ScatterTemplate(style)
+        try:
+            yield template
+        finally:
+            if pool.qsize() < self.pool_size:
+                pool.put(template)
+
+    def scatter(self, x, y, x_label, y_label, title, line=None, line_label=None,
+                style=REGRESSION_STYLE, fmt='png', max_chars=MAX_IMAGE_BYTES, dpi=100):
+        """Draw a scatter (plus optional line) and return it as an EncodedImage"""
+        with self.template(style) as template:
+            template.update(x, y, x_label, y_label, title, line, line_label)
+            # The tight layout engine already fits the labels, so bbox_inches='tight'
+            # would only cost a second draw
+            return encode_to_budget(template.figure, fmt, max_chars, dpi=dpi,
+                                    facecolor='white', edgecolor='none')
+
+    def warm(self, style=REGRESSION_STYLE):
+        """Build and draw one template ahead of the first request"""
+        with self.template(style) as template:
+            template.update([0, 1], [0, 1], 'x', 'y', 'warm-up', line=([0, 1], [0, 1]), line_label='line')
+            template.figure.canvas.draw()
+
+
+_plot_service = PlotService()
+
+
+def get_plot_service():
+    """Process-wide plot service"""
+    return _plot_service
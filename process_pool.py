@@ -0,0 +1,192 @@
+import os
+import time
+import queue
+import logging
+import importlib
+import threading
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+# How often a waiting caller checks for cancellation and dead workers
+POLL_INTERVAL = 0.05
+
+# Imported by the forkserver, so every worker forks with them already loaded
+DEFAULT_PRELOAD = 'app,pandas,numpy,pyarrow,duckdb,lxml.etree,matplotlib.pyplot,seaborn'
+
+
+class JobTimeout(TimeoutError):
+    """The job ran past its timeout; its worker was terminated"""
+
+
+class JobCancelled(Exception):
+    """The caller cancelled the job; its worker was terminated"""
+
+
+class WorkerCrashed(RuntimeError):
+    """The worker process died while running the job"""
+
+
+def _worker_main(conn, preload):
+    """Worker loop: import the heavy modules once, then run (fn, args, kwargs) jobs from conn"""
+    for name in preload:
+        importlib.import_module(name)
+    # Resolve app's lazy imports now rather than during the first job
+    from lazy_imports import prewarm
+    prewarm()
+    try:
+        # Build and draw one figure so fonts and the Agg canvas are ready
+        from plotting import get_plot_service
+        get_plot_service().warm()
+    except Exception as e:
+        logger.warning(f"Plot warm-up failed in worker {os.getpid()}: {e}")
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        fn, args, kwargs = job
+        try:
+            result = ('ok', fn(*args, **kwargs))
+        except Exception as e:
+            result = ('error', e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # Unpicklable result or exception
+            conn.send(('error', RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class _Worker:
+    def __init__(self, context, preload):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, preload), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def stop(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.conn.close()
+
+
+class AnalysisPool:
+    """Pre-started worker processes that run analysis jobs on every core
+
+    Each worker imports the modules in preload and warms the plot fonts before
+    taking jobs. Only a reference to the job function and its arguments is sent;
+    the result comes back pickled over the worker's pipe. A job that runs past
+    its timeout or is cancelled gets its worker terminated and replaced.
+    Forkserver workers fork from a server that already imported preload, so a
+    replacement starts warm.
+    """
+
+    def __init__(self, processes=None, timeout=None, preload=None):
+        self.processes = int(processes or os.environ.get('ANALYSIS_PROCESSES', os.cpu_count() or 1))
+        self.timeout = float(timeout if timeout is not None else os.environ.get('ANALYSIS_JOB_TIMEOUT', 240))
+        if preload is None:
+            preload = [name for name in os.environ.get('ANALYSIS_PRELOAD', DEFAULT_PRELOAD).split(',') if name]
+        self.preload = tuple(preload)
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context('forkserver')
+            self._context.set_forkserver_preload(list(self.preload))
+        else:
+            self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._closed = False
+        for _ in range(self.processes):
+            self._idle.put(self._spawn())
+        logger.info(f"Started {self.processes} analysis worker processes")
+
+    def _spawn(self):
+        worker = _Worker(self._context, self.preload)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _replace(self, worker):
+        worker.stop()
+        with self._lock:
+            self._workers.discard(worker)
+            closed = self._closed
+        if not closed:
+            self._idle.put(self._spawn())
+
+    def run(self, fn, *args, timeout=None, cancel=None, **kwargs):
+        """Run fn(*args, **kwargs) in a worker and return its result
+
+        fn must be importable by name (a module-level function). Raises
+        JobTimeout after timeout seconds, including any wait for a free worker,
+        or JobCancelled once the cancel Event is set. An exception raised by fn is raised here as well.
+        """
+        if self._closed:
+            raise RuntimeError("Analysis pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        # The wait for a free worker counts against the timeout too
+        try:
+            worker = self._idle.get(timeout=max(0, deadline - time.monotonic()))
+        except queue.Empty:
+            raise JobTimeout(f"{fn.__name__} waited {timeout:g}s for a free worker") from None
+        try:
+            worker.conn.send((fn, args, kwargs))
+            while not worker.conn.poll(POLL_INTERVAL):
+                if cancel is not None and cancel.is_set():
+                    raise JobCancelled(f"{fn.__name__} cancelled")
+                if time.monotonic() >= deadline:
+                    raise JobTimeout(f"{fn.__name__} exceeded {timeout:g}s")
+                if not worker.process.is_alive():
+                    raise WorkerCrashed(f"Worker exited with code {worker.process.exitcode}")
+            status, value = worker.conn.recv()
+        except BaseException as e:
+            logger.warning(f"Replacing analysis worker {worker.process.pid}: {e}")
+            self._replace(worker)
+            if isinstance(e, (EOFError, ConnectionError)):
+                raise WorkerCrashed(f"Lost worker {worker.process.pid}: {e}") from e
+            raise
+        self._idle.put(worker)
+        if status == 'error':
+            raise value
+        return value
+
+    def close(self):
+        """Stop all workers"""
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.stop()
+
+
+_analysis_pool = None
+_analysis_pool_pid = None
+_analysis_pool_lock = threading.Lock()
+
+
+def analysis_backend():
+    """'process' to run analyses in the worker pool, else 'thread'"""
+    return os.environ.get('ANALYSIS_BACKEND', 'thread')
+
+
+def get_analysis_pool():
+    """Worker pool for this process, started on first use"""
+    global _analysis_pool, _analysis_pool_pid
+    with _analysis_pool_lock:
+        if _analysis_pool is None or _analysis_pool_pid != os.getpid():
+            _analysis_pool = AnalysisPool()
+            _analysis_pool_pid = os.getpid()
+        return _analysis_pool
@@ -0,0 +1,144 @@
+import os
+import re
+import sys
+import hmac
+import time
+import uuid
+import marshal
+import logging
+import cProfile
+import tempfile
+import threading
+from collections import Counter
+from file_lock import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'data-analyst-agent', 'profiles')
+
+# pstats loads with pstats.Stats(path); collapsed stacks feed flamegraph.pl or speedscope
+MODES = {'pstats': '.pstats', 'collapsed': '.collapsed'}
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+def profiling_enabled():
+    """Profiling is off unless PROFILE_TOKEN is set"""
+    return bool(os.environ.get('PROFILE_TOKEN'))
+
+
+def profile_authorized(token):
+    """True if token (the X-Profile header) matches PROFILE_TOKEN"""
+    expected = os.environ.get('PROFILE_TOKEN')
+    if not expected or not token:
+        return False
+    return hmac.compare_digest(token.encode(), expected.encode())
+
+
+def make_request_id(requested=None):
+    """The caller's X-Request-Id if it is safe to use in a file name, else a new one"""
+    if requested and _REQUEST_ID.match(requested):
+        return requested
+    return uuid.uuid4().hex
+
+
+class StackSampler:
+    """Samples one thread's Python stack every interval seconds into collapsed-stack counts"""
+
+    def __init__(self, thread_id=None, interval=None):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = float(interval or os.environ.get('PROFILE_INTERVAL', 0.005))
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='profile-sampler', daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.counts.most_common()).encode()
+
+
+class ProfileStore:
+    """Profile artifacts on disk, named by request id; only the newest max_files are kept"""
+
+    def __init__(self, profile_dir=None, max_files=None):
+        self.profile_dir = profile_dir or os.environ.get('PROFILE_DIR', DEFAULT_PROFILE_DIR)
+        self.max_files = int(max_files or os.environ.get('PROFILE_KEEP', 50))
+
+    def path(self, request_id, mode):
+        return os.path.join(self.profile_dir, f"{request_id}{MODES[mode]}")
+
+    def save(self, request_id, mode, data):
+        path = self.path(request_id, mode)
+        atomic_write(path, data)
+        self._prune()
+        return path
+
+    def find(self, request_id):
+        """(path, mode) of the stored profile for request_id, or None"""
+        if not _REQUEST_ID.match(request_id or ''):
+            return None
+        for mode in MODES:
+            path = self.path(request_id, mode)
+            if os.path.exists(path):
+                return path, mode
+        return None
+
+    def _prune(self):
+        try:
+            entries = [entry for entry in os.scandir(self.profile_dir)
+                       if entry.name.endswith(tuple(MODES.values()))]
+            entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+            for entry in entries[self.max_files:]:
+                os.remove(entry.path)
+        except OSError as e:
+            logger.warning(f"Failed to prune profiles: {e}")
+
+
+def profile_call(request_id, mode, fn, *args, **kwargs):
+    """Run fn under cProfile (pstats) or the stack sampler (collapsed) and store the profile
+
+    Returns (result, profile path). Profiles the calling thread only.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown profile format {mode!r}; use one of {', '.join(MODES)}")
+    started = time.perf_counter()
+    if mode == 'pstats':
+        profiler = cProfile.Profile()
+        result = profiler.runcall(fn, *args, **kwargs)
+        profiler.create_stats()
+        data = marshal.dumps(profiler.stats)
+    else:
+        with StackSampler() as sampler:
+            result = fn(*args, **kwargs)
+        data = sampler.collapsed()
+    path = get_profile_store().save(request_id, mode, data)
+    logger.info(f"Profiled request {request_id} ({mode}) in {time.perf_counter() - started:.2f}s: {path}")
+    return result, path
+
+
+_profile_store = None
+
+
+def get_profile_store():
+    global _profile_store
+    if _profile_store is None:
+        _profile_store = ProfileStore()
+    return _profile_store
@@ -0,0 +1,178 @@
+import os
+import re
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+NUMBERED_QUESTION = re.compile(r'^\s*(\d+)[.)]\s+(.+?)\s*$', re.MULTILINE)
+
+
+def numbered_questions(questions_text):
+    """The '1. ...' lines of the questions, as (number, text) in order"""
+    return [(int(number), text) for number, text in NUMBERED_QUESTION.findall(questions_text)]
+
+
+def match_operations(questions, rules):
+    """Node name for each question: the first (node, pattern) rule whose pattern it matches, else None"""
+    matched = []
+    for _, text in questions:
+        matched.append(next((node for node, pattern in rules if re.search(pattern, text, re.IGNORECASE)), None))
+    return matched
+
+
+class Plan:
+    """A DAG of named operations, each computed at most once per run
+
+    add(name, fn, *deps) registers fn, which is called with the results of
+    deps. run() computes the requested nodes and everything they depend on,
+    running independent nodes in parallel on an executor.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, name, fn, *deps):
+        for dep in deps:
+            if dep not in self.nodes:
+                raise KeyError(f"Unknown dependency {dep!r} of plan node {name!r}")
+        self.nodes[name] = (fn, deps)
+        return name
+
+    def _needed(self, targets):
+        needed, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.nodes[name][1])
+        return needed
+
+    def _call(self, name, args, expires=None):
+        # A node still queued on a busy pool when the timeout passes is skipped, so it frees the thread
+        if expires is not None and time.monotonic() >= expires:
+            raise TimeoutError(f"Plan node {name} not started before the timeout")
+        fn, _ = self.nodes[name]
+        return fn(*args)
+
+    def run(self, targets=None, executor=None, on_result=None, timeout=None):
+        """Compute targets (default: every node); returns (results, errors) keyed by node name
+
+        A node whose dependency failed fails with the same exception.
+        on_result(name, result, error) is called from this thread as each
+        node finishes, in completion order. Without an executor the nodes
+        run one at a time in this thread. Nodes not finished within timeout
+        seconds fail with TimeoutError. Those still queued on the executor are
+        cancelled or skipped; ones already running are left to finish in the
+        background.
+        """
+        pending = self._needed(self.nodes if targets is None else targets)
+        results, errors, running = {}, {}, {}
+        expires = None if timeout is None else time.monotonic() + timeout
+
+        def finish(name, result=None, error=None):
+            if error is not None:
+                errors[name] = error
+            else:
+                results[name] = result
+            if on_result is not None:
+                on_result(name, result, error)
+
+        while pending or running:
+            ready = [name for name in self.nodes if name in pending
+                     and all(dep in results or dep in errors for dep in self.nodes[name][1])]
+            for name in ready:
+                pending.discard(name)
+                deps = self.nodes[name][1]
+                failed = next((errors[dep] for dep in deps if dep in errors), None)
+                if failed is None and expires is not None and time.monotonic() >= expires:
+                    failed = TimeoutError(f"Plan node {name} not started before the timeout")
+                if failed is not None:
+                    finish(name, error=failed)
+                elif executor is None:
+                    try:
+                        finish(name, self._call(name, [results[dep] for dep in deps]))
+                    except Exception as e:
+                        logger.warning(f"Plan node {name} failed: {e}")
+                        finish(name, error=e)
+                else:
+                    # Each node runs in a copy of this context, so its spans reach the request
+                    context = contextvars.copy_context()
+                    future = executor.submit(context.run, self._call, name, [results[dep] for dep in deps], expires)
+                    running[future] = name
+            if ready or not running:
+                continue
+            left = None if expires is None else max(0.0, expires - time.monotonic())
+            done, _ = wait(running, timeout=left, return_when=FIRST_COMPLETED)
+            if not done:
+                for future, name in running.items():
+                    if not future.cancel():
+                        logger.warning(f"Plan node {name} still running at the timeout")
+                    finish(name, error=TimeoutError(f"Plan node {name} did not finish before the timeout"))
+                running.clear()
+            for future in done:
+                name = running.pop(future)
+                try:
+                    finish(name, future.result())
+                except Exception as e:
+                    logger.warning(f"Plan node {name} failed: {e}")
+                    finish(name, error=e)
+        return results, errors
+
+
+class SharedResults:
+    """Results computed once and shared by several plans, e.g. the files of one batch
+
+    get(name, fn) returns fn() for the first caller; concurrent and later
+    callers with the same name wait for and reuse that result, or its error.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, fn):
+        with self._lock:
+            future = self._futures.get(name)
+            leader = future is None
+            if leader:
+                future = self._futures[name] = Future()
+        if leader:
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_inline = contextvars.ContextVar('plan_inline', default=False)
+
+
+@contextmanager
+def run_inline():
+    """Run plans in the calling thread within this block, e.g. so a profiler sees every node"""
+    token = _inline.set(True)
+    try:
+        yield
+    finally:
+        _inline.reset(token)
+
+
+def get_plan_executor():
+    """Process-wide pool for plan nodes (PLAN_WORKERS, default 4); None runs plans inline"""
+    global _executor, _executor_pid
+    workers = int(os.environ.get('PLAN_WORKERS', 4))
+    if workers <= 1 or _inline.get():
+        return None
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='plan')
+            _executor_pid = os.getpid()
+        return _executor
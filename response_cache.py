@@ -0,0 +1,131 @@
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from file_lock import file_lock, atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'data-analyst-agent', 'responses')
+
+
+def normalize_questions(questions_text):
+    """Canonical form of questions.txt: line endings, trailing spaces and blank runs don't matter"""
+    lines = [' '.join(line.split()) for line in questions_text.splitlines()]
+    return '\n'.join(line for line in lines if line)
+
+
+def response_key(questions_text, data_version):
+    """Hash of the normalized questions plus the version of the data they are answered from"""
+    digest = hashlib.sha256(str(data_version).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(normalize_questions(questions_text).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Serialized /api/ responses, in an in-process LRU and optionally on disk for all workers
+
+    Each entry carries its own expiry time. On disk the expiry is written as the
+    first line of the file, followed by the response body.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, cache_dir=None, disk=None):
+        self.max_entries = int(max_entries if max_entries is not None else os.environ.get('RESPONSE_CACHE_ENTRIES', 64))
+        self.ttl = float(ttl if ttl is not None else os.environ.get('RESPONSE_CACHE_TTL', 600))
+        if disk is None:
+            disk = os.environ.get('RESPONSE_CACHE_DISK', '1') != '0'
+        self.cache_dir = (cache_dir or os.environ.get('RESPONSE_CACHE_DIR', DEFAULT_CACHE_DIR)) if disk else None
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.response")
+
+    def _remember(self, key, expires_at, body):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (expires_at, body)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at = float(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if expires_at <= time.time():
+            self._unlink(self._path(key))
+            return None
+        return expires_at, body
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def get(self, key):
+        """Cached body for key, or None if absent or expired"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._memory.move_to_end(key)
+                    return entry[1]
+                del self._memory[key]
+        if not self.cache_dir:
+            return None
+        entry = self._read_disk(key)
+        if entry is None:
+            return None
+        self._remember(key, *entry)
+        return entry[1]
+
+    def put(self, key, body, ttl=None):
+        """Store body (bytes) under key for ttl seconds, defaulting to the cache's TTL"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._remember(key, expires_at, body)
+        if not self.cache_dir:
+            return
+        try:
+            atomic_write(self._path(key), f"{expires_at}\n".encode('ascii') + body)
+            self._sweep()
+        except OSError as e:
+            logger.warning(f"Failed to write response cache entry {key}: {e}")
+
+    def _sweep(self):
+        """Delete expired files so the shared directory doesn't grow without bound"""
+        now = time.time()
+        with file_lock(os.path.join(self.cache_dir, '.sweep.lock')):
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.response'):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    with open(path, 'rb') as f:
+                        expires_at = float(f.readline())
+                except (OSError, ValueError):
+                    continue
+                if expires_at <= now:
+                    self._unlink(path)
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """Process-wide response cache"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,92 @@
+import os
+import logging
+import tempfile
+import threading
+from file_lock import LockTimeout, file_lock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCK_DIR = os.path.join(tempfile.gettempdir(), 'data-analyst-agent', 'flights')
+
+
+class _Call:
+    """One in-flight computation and the callers waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one computation per key; concurrent callers share its result
+
+    Threads in a worker wait on an Event for the leader's result. Leaders in
+    different workers take a per-key file lock, so only one of them computes at
+    a time. The computation should first look for a result another worker has
+    just stored (e.g. in the response cache) before doing the work itself.
+    """
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir or os.environ.get('SINGLE_FLIGHT_DIR', DEFAULT_LOCK_DIR)
+        self._calls = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn, timeout=None):
+        """Return (fn's result, shared) where shared is True if another caller computed it
+
+        A caller that has waited timeout seconds for the leader, or a leader
+        that has waited that long for another worker's file lock, stops waiting
+        and returns fn()'s result of its own.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                return fn(), False
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = self._run_locked(key, fn, timeout)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.info(f"Shared one computation with {call.waiters} waiting requests")
+            call.done.set()
+        return call.result, False
+
+    def _run_locked(self, key, fn, timeout):
+        """fn() under the key's file lock, or without it once timeout seconds have passed waiting"""
+        locked = False
+        try:
+            with file_lock(os.path.join(self.lock_dir, f"{key}.lock"), timeout=timeout):
+                locked = True
+                return fn()
+        except LockTimeout:
+            if locked:
+                raise
+        logger.warning(f"Another worker still holds the flight lock for {key} after {timeout:g}s, computing anyway")
+        return fn()
+
+
+# Created at import so threads can never end up with different groups
+_single_flight = SingleFlight()
+
+
+def get_single_flight():
+    """Process-wide single-flight group"""
+    return _single_flight
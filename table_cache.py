@@ -0,0 +1,124 @@
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+import pyarrow as pa
+import pyarrow.parquet as pq
+from file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'data-analyst-agent', 'tables')
+
+
+def content_key(content, schema_version):
+    """Hash of the page bytes plus the version of the cleaning code that produced the table"""
+    digest = hashlib.sha256(schema_version.encode('utf-8'))
+    digest.update(content)
+    return digest.hexdigest()
+
+
+class TableCache:
+    """Typed DataFrames keyed by content hash, in memory and as Parquet files on disk
+
+    Files unread for max_age seconds are deleted, and the least recently used
+    ones are evicted to keep the directory under max_bytes.
+    """
+
+    def __init__(self, cache_dir=None, memory_entries=None, max_bytes=None, max_age=None):
+        self.cache_dir = cache_dir or os.environ.get('TABLE_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.memory_entries = int(memory_entries if memory_entries is not None else os.environ.get('TABLE_CACHE_ENTRIES', 8))
+        self.max_bytes = int(max_bytes if max_bytes is not None else os.environ.get('TABLE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+        self.max_age = float(max_age if max_age is not None else os.environ.get('TABLE_CACHE_MAX_AGE', 7 * 86400))
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _remember(self, key, df):
+        with self._lock:
+            self._memory[key] = df
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Cached frame for key, or None"""
+        with self._lock:
+            df = self._memory.get(key)
+            if df is not None:
+                self._memory.move_to_end(key)
+        if df is None:
+            path = self._path(key)
+            if not os.path.exists(path):
+                return None
+            try:
+                df = pq.read_table(path).to_pandas()
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable table cache entry {path}: {e}")
+                return None
+            # The file's mtime doubles as the LRU access time
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self._remember(key, df)
+        # Shallow copy so callers can add columns without touching the cached frame
+        return df.copy(deep=False)
+
+    def put(self, key, df):
+        """Store df under key in memory and on disk"""
+        self._remember(key, df)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write table cache entry {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        """Drop files older than max_age, then least recently used ones until the rest fit in max_bytes"""
+        expired_before = time.time() - self.max_age
+        with file_lock(os.path.join(self.cache_dir, '.evict.lock')):
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.parquet'):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            entries.sort()
+            while entries and (total > self.max_bytes or entries[0][0] < expired_before):
+                _, size, path = entries.pop(0)
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                total -= size
+                logger.info(f"Evicted {path} from table cache")
+
+
+_table_cache = None
+
+
+def get_table_cache():
+    """Process-wide table cache"""
+    global _table_cache
+    if _table_cache is None:
+        _table_cache = TableCache()
+    return _table_cache
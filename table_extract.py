@@ -0,0 +1,98 @@
+import io
+import re
+from lxml import etree
+
+CITATION_RE = re.compile(r'\[.*?\]')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def cell_text(cell):
+    """Visible text of a cell with citation markers removed and whitespace collapsed"""
+    text = ''.join(cell.itertext())
+    text = CITATION_RE.sub('', text)
+    return WHITESPACE_RE.sub(' ', text).strip()
+
+
+def _span(cell, name):
+    try:
+        return max(1, int(cell.get(name, 1)))
+    except ValueError:
+        return 1
+
+
+def table_rows(table):
+    """Expand a <table> into a rectangular list of rows, honouring rowspan/colspan"""
+    rows = []
+    pending = {}  # column -> (rows still covered, text)
+    for tr in table.iter('tr'):
+        # Skip rows that belong to a table nested inside this one
+        if next(tr.iterancestors('table'), None) is not table:
+            continue
+        row = []
+        col = 0
+        for cell in tr:
+            if cell.tag not in ('td', 'th'):
+                continue
+            while col in pending:
+                row.append(pending[col][1])
+                col = _consume(pending, col)
+            text = cell_text(cell)
+            rowspan = _span(cell, 'rowspan')
+            for _ in range(_span(cell, 'colspan')):
+                row.append(text)
+                if rowspan > 1:
+                    pending[col] = (rowspan - 1, text)
+                col += 1
+        # Cells spanning into the end of this row
+        while col in pending:
+            row.append(pending[col][1])
+            col = _consume(pending, col)
+        if row:
+            rows.append(row)
+    return rows
+
+
+def _consume(pending, col):
+    remaining, text = pending[col]
+    if remaining > 1:
+        pending[col] = (remaining - 1, text)
+    else:
+        del pending[col]
+    return col + 1
+
+
+def extract_wikitable(html, classes=('wikitable', 'sortable')):
+    """First <table> carrying all of classes as (headers, rows), else the first wikitable
+
+    The page is parsed incrementally with lxml and parsing stops as soon as the
+    target table is complete. Elements outside tables are discarded as they
+    finish, so memory stays small on large pages. Returns None if the page
+    has no wikitable.
+    """
+    fallback = None
+    table_depth = 0
+    wanted = set(classes)
+    for event, elem in etree.iterparse(io.BytesIO(html), events=('start', 'end'), html=True):
+        if elem.tag == 'table':
+            if event == 'start':
+                table_depth += 1
+                continue
+            table_depth -= 1
+            elem_classes = set((elem.get('class') or '').split())
+            if wanted <= elem_classes:
+                rows = table_rows(elem)
+                return (rows[0], rows[1:]) if rows else None
+            if fallback is None and 'wikitable' in elem_classes:
+                rows = table_rows(elem)
+                if rows:
+                    fallback = (rows[0], rows[1:])
+        elif event == 'end' and table_depth == 0:
+            # Free finished elements that cannot be part of a table
+            elem.clear()
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+        if event == 'end' and elem.tag == 'table' and table_depth == 0:
+            elem.clear()
+    return fallback
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the ASGI entry point (no network)
+Run with: python -m pytest test_asgi.py
+"""
+
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from starlette.testclient import TestClient
+
+import asgi
+from app import FILMS_URL
+from conftest import stub_server
+from http_cache import HttpCache
+
+
+def test_async_fetcher_shares_one_request_and_fills_the_cache(tmp_path):
+    with stub_server({'/page': b'<html>films</html>'}) as (server, base):
+        cache = HttpCache(str(tmp_path), ttl=60)
+
+        async def fetch_many():
+            async with httpx.AsyncClient() as client:
+                fetcher = asgi.AsyncFetcher(client, cache)
+                return await asyncio.gather(*(fetcher.get(f"{base}/page") for _ in range(5)))
+
+        responses = asyncio.run(fetch_many())
+        assert [r.content for r in responses] == [b'<html>films</html>'] * 5
+        assert len(server.hits) == 1
+        # The synchronous analysis path now finds a fresh copy
+        assert cache.get(f"{base}/page").from_cache
+        assert len(server.hits) == 1
+
+
+def test_async_fetcher_waits_for_another_workers_fetch(tmp_path):
+    with stub_server({'/page': b'<html>films</html>'}) as (server, base):
+        url = f"{base}/page"
+        cache = HttpCache(str(tmp_path), ttl=60)
+
+        async def fetch():
+            async with httpx.AsyncClient() as client:
+                return await asgi.AsyncFetcher(client, cache).get(url)
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            # Another worker holds the URL's lock and stores its copy before releasing it
+            with cache.fetch_lock(url):
+                future = pool.submit(asyncio.run, fetch())
+                time.sleep(0.2)
+                cache._store(url, b'<html>other</html>', {'url': url, 'fetched_at': time.time(), 'etag': 'other'})
+            assert future.result().content == b'<html>other</html>'
+        assert server.hits == []
+
+
+def post_questions(client, text):
+    return client.post('/api/', files={'questions.txt': ('questions.txt', io.BytesIO(text.encode()))})
+
+
+def test_routes_match_the_flask_app(caches):
+    with TestClient(asgi.app) as client:
+        assert client.get('/health').json()['status'] == 'healthy'
+        assert client.get('/').json()['endpoints']['analyze'] == '/api/ (POST)'
+        assert client.get('/missing').json() == {'error': 'Endpoint not found'}
+        assert client.post('/api/', files={}).status_code == 400
+
+        first = post_questions(client, 'What is the mean?')
+        assert first.json() == ["No specific analysis available"]
+        assert first.headers['X-Cache'] == 'MISS'
+        assert post_questions(client, 'What is the mean?\n').headers['X-Cache'] == 'HIT'
+
+
+def test_films_analysis_runs_on_the_executor(films_page, monkeypatch):
+    monkeypatch.setenv('SERVER_TIMING', '1')
+    with TestClient(asgi.app) as client:
+        response = post_questions(client, f"Scrape {FILMS_URL}\n1. How many $2 bn movies were released before 2000?")
+    answers = response.json()
+    assert response.status_code == 200 and len(answers) == 4
+    assert answers[3].startswith('data:image/png;base64,')
+    # Spans from the executor thread reach the response header
+    assert 'films.prefetch;dur=' in response.headers['Server-Timing']
+    assert 'plot.render;dur=' in response.headers['Server-Timing']
+    assert 'route="/api/"' in client.get('/metrics').text
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_async_fetcher_shares_one_request_and_fills_the_cache,
+                 test_async_fetcher_waits_for_another_workers_fetch):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ ASGI fetcher tests passed (run the route tests with pytest)")
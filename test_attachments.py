@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed attachment ingestion and DuckDB views over the attachments
+Run with: python -m pytest test_attachments.py
+"""
+
+import io
+import os
+
+import duckdb
+import pytest
+
+from attachments import (AttachmentDatabase, UploadTooLarge, attachments_version, extract_sql,
+                         ingest_uploads, spool_file, table_name)
+
+SALES_CSV = b"region,amount\nnorth,10\nsouth,20\nnorth,5\n"
+
+QUESTIONS = """Total sales by region:
+```sql
+SELECT region, SUM(amount) AS total FROM sales GROUP BY region ORDER BY region
+```
+"""
+
+
+def test_uploads_are_streamed_to_named_files(tmp_path, monkeypatch):
+    assert table_name('Sales 2024.CSV.gz', set()) == 'sales_2024'
+    assert table_name('2024.csv', {'t_2024'}) == 't_2024_2'
+
+    uploads = [('sales.csv', io.BytesIO(SALES_CSV)), ('notes.docx', io.BytesIO(b'x')),
+               ('events.jsonl', io.BytesIO(b'{"a": 1}\n{"a": 2}\n'))]
+    uploaded, directory = ingest_uploads(uploads, str(tmp_path))
+    assert [(a.table, a.reader, a.nbytes) for a in uploaded] == [('sales', 'read_csv', len(SALES_CSV)),
+                                                                 ('events', 'read_json', 18)]
+    assert open(uploaded[0].path, 'rb').read() == SALES_CSV
+    assert attachments_version(uploaded) != attachments_version(uploaded[:1])
+
+    monkeypatch.setenv('MAX_UPLOAD_BYTES', '10')
+    with pytest.raises(UploadTooLarge):
+        ingest_uploads([('big.csv', io.BytesIO(SALES_CSV))], str(tmp_path))
+    assert os.listdir(tmp_path) == [os.path.basename(directory)]  # the partial upload was removed
+
+    # A file the web server spooled into the upload directory is linked, not copied
+    monkeypatch.setenv('UPLOAD_DIR', str(tmp_path / 'spooled'))
+    monkeypatch.setenv('MAX_UPLOAD_BYTES', '1000')
+    with spool_file() as spooled:
+        spooled.write(SALES_CSV)
+        spooled.seek(0)
+        linked, _ = ingest_uploads([('sales.csv', spooled)])
+        assert os.stat(linked[0].path).st_nlink == 2
+    assert open(linked[0].path, 'rb').read() == SALES_CSV and linked[0].digest == uploaded[0].digest
+
+
+def test_views_are_queried_inside_a_sandbox(tmp_path):
+    parquet = tmp_path / 'scores.parquet'
+    duckdb.sql(f"COPY (SELECT range AS id, range * 1.5 AS score FROM range(100)) TO '{parquet}' (FORMAT PARQUET)")
+    with open(parquet, 'rb') as f:
+        uploaded, _ = ingest_uploads([('sales.csv', io.BytesIO(SALES_CSV)), ('scores.parquet', f)],
+                                     str(tmp_path / 'uploads'))
+
+    with AttachmentDatabase(uploaded, max_rows=3) as db:
+        summary = {item['table']: item for item in db.summaries()}
+        assert summary['scores']['rows'] == 100
+        assert [c['column_name'] for c in summary['sales']['columns']] == ['region', 'amount']
+        assert db.query("SELECT id FROM scores ORDER BY id") == [{'id': 0}, {'id': 1}, {'id': 2}]
+        assert len(db.query("SELECT * FROM range(1000000000000)")) == 3  # the limit stops the scan
+        assert db.query("SELECT INTERVAL 90 SECOND AS wait, '\\xAA'::BLOB AS raw, 1.50::DECIMAL(4, 2) AS price, "
+                        "DATE '2024-01-31' AS day, 'nan'::DOUBLE AS missing") == [
+            {'wait': 90.0, 'raw': 'qg==', 'price': 1.5, 'day': '2024-01-31', 'missing': None}
+        ]
+        assert db.query("CREATE TABLE scratch (id INTEGER)") == []
+        with pytest.raises(duckdb.Error):
+            db.query(f"SELECT * FROM read_parquet('{parquet}')")  # outside the upload directory
+    assert extract_sql(QUESTIONS) == [
+        'SELECT region, SUM(amount) AS total FROM sales GROUP BY region ORDER BY region'
+    ]
+
+
+def post_with_attachment(client, questions, filename='sales.csv', data=SALES_CSV):
+    return client.post('/api/', data={'questions.txt': (io.BytesIO(questions.encode()), 'questions.txt'),
+                                      'data': (io.BytesIO(data), filename)})
+
+
+def test_api_answers_from_attachments(caches, tmp_path, monkeypatch):
+    import app
+    monkeypatch.setenv('UPLOAD_DIR', str(tmp_path / 'uploads'))
+    client = app.app.test_client()
+
+    first = post_with_attachment(client, QUESTIONS)
+    assert first.get_json() == [[{'region': 'north', 'total': 15}, {'region': 'south', 'total': 20}]]
+    assert first.headers['X-Cache'] == 'MISS'
+    assert post_with_attachment(client, QUESTIONS).headers['X-Cache'] == 'HIT'
+    # Other data is another cache entry
+    changed = post_with_attachment(client, QUESTIONS, data=SALES_CSV + b"south,1\n")
+    assert changed.headers['X-Cache'] == 'MISS' and changed.get_json()[0][1]['total'] == 21
+
+    summary = post_with_attachment(client, 'Describe the data').get_json()
+    assert summary[0]['table'] == 'sales' and summary[0]['rows'] == 3
+    failed = post_with_attachment(client, "```sql\nSELECT nope FROM sales\n```")
+    assert 'error' in failed.get_json()[0] and failed.headers['X-Cache'] == 'BYPASS'
+    assert os.listdir(tmp_path / 'uploads') == []  # removed after each request
+
+    # Only /api/ takes large bodies; /api/batch reads its files into memory
+    monkeypatch.setitem(app.app.config, 'MAX_CONTENT_LENGTH', 200)
+    assert post_with_attachment(client, QUESTIONS, data=SALES_CSV * 10).status_code == 200
+    batch = client.post('/api/batch', data={'a.txt': (io.BytesIO(QUESTIONS.encode() * 3), 'a.txt')})
+    assert batch.status_code == 413
+
+    monkeypatch.setenv('MAX_UPLOAD_BYTES', '10')
+    assert post_with_attachment(client, QUESTIONS).status_code == 413
+
+
+def test_asgi_answers_from_attachments(caches, tmp_path, monkeypatch):
+    from starlette.testclient import TestClient
+    import asgi
+    monkeypatch.setenv('UPLOAD_DIR', str(tmp_path / 'uploads'))
+    with TestClient(asgi.app) as client:
+        response = client.post('/api/', files={'questions.txt': ('questions.txt', QUESTIONS.encode()),
+                                               'data': ('sales.csv', SALES_CSV)})
+    assert response.json() == [[{'region': 'north', 'total': 15}, {'region': 'south', 'total': 20}]]
+    assert os.listdir(tmp_path / 'uploads') == []
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as tmp:
+        test_views_are_queried_inside_a_sandbox(Path(tmp))
+    print("✅ attachment tests passed (run the route tests with pytest)")
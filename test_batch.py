@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for /api/batch: one data load per source, one NDJSON line per file
+Run with: python -m pytest test_batch.py
+"""
+
+import io
+import json
+
+from starlette.testclient import TestClient
+
+import app
+import asgi
+from conftest import FILMS_QUESTIONS as QUESTIONS
+
+REORDERED = QUESTIONS.replace('1. How many', '0. How many')
+
+
+def batch_files(*texts):
+    return [('files', (f'q{n}.txt', io.BytesIO(text.encode()))) for n, text in enumerate(texts)]
+
+
+def test_batch_line_embeds_the_serialized_answers():
+    line = app.batch_line(2, 'q.txt', 'films', 'HIT', b'[1, "Titanic"]\n')
+    assert line.endswith(b'}\n') and line.count(b'\n') == 1
+    assert json.loads(line) == {'index': 2, 'file': 'q.txt', 'source': 'films', 'cache': 'HIT',
+                                'answers': [1, 'Titanic']}
+
+
+def test_batch_loads_each_source_once(films_page, monkeypatch):
+    loads = []
+    load_films_table = app.DataAnalyst.load_films_table
+    monkeypatch.setattr(app.DataAnalyst, 'load_films_table',
+                        lambda self, url: loads.append(url) or load_films_table(self, url))
+
+    client = app.app.test_client()
+    response = client.post('/api/batch', data={'files': [
+        (io.BytesIO(QUESTIONS.encode()), 'a.txt'),
+        (io.BytesIO(REORDERED.encode()), 'b.txt'),
+        (io.BytesIO(QUESTIONS.encode()), 'c.txt'),
+        (io.BytesIO(b'What is the mean?'), 'd.txt'),
+    ]})
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    lines = {line['file']: line for line in map(json.loads, response.get_data(as_text=True).splitlines())}
+    assert sorted(lines) == ['a.txt', 'b.txt', 'c.txt', 'd.txt']
+    assert len(loads) == 1
+
+    assert lines['a.txt']['index'] == 0 and lines['a.txt']['source'] == 'films'
+    assert lines['a.txt']['cache'] == 'MISS' and lines['c.txt']['cache'] == 'SHARED'
+    assert lines['c.txt']['answers'] == lines['a.txt']['answers']
+    assert lines['b.txt']['answers'][:3] == lines['a.txt']['answers'][:3]
+    assert lines['d.txt'] == {'index': 3, 'file': 'd.txt', 'source': 'generic', 'cache': 'MISS',
+                              'answers': ["No specific analysis available"]}
+
+    # The batch answers are the ones /api/ gives, from the same response cache
+    single = client.post('/api/', data={'questions.txt': (io.BytesIO(QUESTIONS.encode()), 'questions.txt')})
+    assert single.headers['X-Cache'] == 'HIT'
+    assert single.get_json() == lines['a.txt']['answers']
+
+
+def test_batch_limits_and_asgi_route(caches, monkeypatch):
+    client = app.app.test_client()
+    assert client.post('/api/batch', data={}).status_code == 400
+    monkeypatch.setenv('BATCH_MAX_FILES', '1')
+    assert client.post('/api/batch', data={'files': [(io.BytesIO(b'a'), 'a.txt'),
+                                                     (io.BytesIO(b'b'), 'b.txt')]}).status_code == 400
+    monkeypatch.delenv('BATCH_MAX_FILES')
+
+    with TestClient(asgi.app) as asgi_client:
+        response = asgi_client.post('/api/batch', files=batch_files('What is the mean?', 'What is the median?'))
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = sorted(map(json.loads, response.text.splitlines()), key=lambda line: line['index'])
+    assert [line['file'] for line in lines] == ['q0.txt', 'q1.txt']
+    assert lines[1]['answers'] == ["No specific analysis available"]
+
+
+if __name__ == "__main__":
+    test_batch_line_embeds_the_serialized_answers()
+    print("✅ Batch line test passed (run the route tests with pytest)")
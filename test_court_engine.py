@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Tests for the DuckDB court engine against a small local partitioned dataset
+Run with: python -m pytest test_court_engine.py
+"""
+
+import io
+import os
+from datetime import date, timedelta
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+import court_engine
+from court_engine import CourtQueryEngine, CourtConnectionPool
+from court_summary import CourtSummaryCache
+
+COURTS = {'33_10': 5, '7_26': 3, '1_12': 2}  # rows per bench per year
+YEARS = range(2017, 2024)
+
+
+def make_court_dataset(root):
+    """Write a year=*/court=*/bench=*/metadata.parquet tree and return its rows"""
+    con = duckdb.connect()
+    frames = []
+    for year in YEARS:
+        for court, per_bench in COURTS.items():
+            for bench in ('b1', 'b2'):
+                rows = []
+                for i in range(per_bench):
+                    registered = date(year - 1, 1 + i, 10)
+                    decided = registered + timedelta(days=30 * (year - 2015) + 7 * i)
+                    rows.append({
+                        'date_of_registration': registered.strftime('%d-%m-%Y'),
+                        'decision_date': decided,
+                        'title': f'{court} {bench} {year} {i}',
+                    })
+                df = pd.DataFrame(rows)
+                part = os.path.join(root, f'year={year}', f'court={court}', f'bench={bench}')
+                os.makedirs(part)
+                con.register('part_df', df)
+                con.execute(f"COPY part_df TO '{part}/metadata.parquet' (FORMAT PARQUET)")
+                con.unregister('part_df')
+                frames.append(df.assign(year=year, court=court, bench=bench))
+    con.close()
+    return pd.concat(frames, ignore_index=True)
+
+
+COURT_QUESTIONS = """The Indian high court judgement dataset (indian-high-court-judgments) is queried with DuckDB.
+
+{
+  "Which high court disposed the most cases from 2019 - 2022?": "...",
+  "What's the regression slope of the date_of_registration - decision_date by year in the court=33_10?": "...",
+  "Plot the year and # of days of delay from the above question as a scatterplot with a regression line. Encode as a base64 data URI under 100,000 characters": "data:image/webp:base64,..."
+}
+"""
+
+
+def expected_delays(rows):
+    registered = pd.to_datetime(rows['date_of_registration'], format='%d-%m-%Y')
+    return rows.assign(delay=(pd.to_datetime(rows['decision_date']) - registered).dt.days)
+
+
+def test_partition_paths_prune_years_and_court(tmp_path):
+    engine = CourtQueryEngine(str(tmp_path))
+    paths = engine.partition_paths(years=range(2019, 2023), court='33_10')
+    assert len(paths) == 4
+    assert all('court=33_10' in p for p in paths)
+    assert paths[0].endswith('year=2019/court=33_10/bench=*/metadata.parquet')
+
+
+def test_top_court_by_disposals(tmp_path):
+    make_court_dataset(str(tmp_path))
+    engine = CourtQueryEngine(str(tmp_path))
+    assert engine.top_court_by_disposals(2019, 2022) == '33_10'
+    # Years with no partitions are skipped rather than failing the scan
+    assert engine.top_court_by_disposals(2030, 2031) is None
+
+
+def test_delay_regression_slope_matches_numpy(tmp_path):
+    rows = expected_delays(make_court_dataset(str(tmp_path)))
+    court_rows = rows[rows['court'] == '7_26']
+    expected = np.polyfit(court_rows['year'], court_rows['delay'], 1)[0]
+
+    engine = CourtQueryEngine(str(tmp_path))
+    assert abs(engine.delay_regression_slope('7_26') - expected) < 1e-6
+
+    by_year = engine.delay_by_year('7_26')
+    assert list(by_year['year']) == list(YEARS)
+    assert np.allclose(by_year['mean_delay'], court_rows.groupby('year')['delay'].mean().to_numpy())
+
+
+def test_pool_reuses_cursors_with_prepared_statements(tmp_path):
+    make_court_dataset(str(tmp_path))
+    pool = CourtConnectionPool(str(tmp_path), size=2, threads=2, memory_limit='256MB')
+    with pool.engine() as engine:
+        first = engine
+        # The standard questions are prepared when the cursor is created
+        assert 'top_court_2019_2022' in engine._statements
+        assert engine.top_court_by_disposals(2019, 2022) == '33_10'
+    with pool.engine() as engine:
+        assert engine is first
+        assert engine.delay_regression_slope('33_10') is not None
+    assert pool.conn.execute("SELECT current_setting('threads')").fetchone()[0] == 2
+    pool.close()
+
+
+def test_new_partitions_are_seen_once_the_version_changes(tmp_path):
+    make_court_dataset(str(tmp_path))
+    pool = CourtConnectionPool(str(tmp_path), size=1)
+    with pool.engine() as engine:
+        engine.refresh('v1')
+        assert engine.top_court_by_disposals(2030, 2031) is None
+        extra = tmp_path / 'year=2030' / 'court=1_12' / 'bench=b1'
+        extra.mkdir(parents=True)
+        engine.conn.execute(f"COPY (SELECT '01-01-2030' AS date_of_registration, DATE '2030-02-01' AS decision_date) "
+                            f"TO '{extra}/metadata.parquet' (FORMAT PARQUET)")
+        # The statement still has the partitions it was prepared with...
+        engine.refresh('v1')
+        assert engine.top_court_by_disposals(2030, 2031) is None
+        # ...until the dataset version changes
+        engine.refresh('v2')
+        assert engine.top_court_by_disposals(2030, 2031) == '1_12'
+        assert engine.top_court_by_disposals(2019, 2022) == '33_10'
+    pool.close()
+
+
+def write_partition(root, year, court, sql):
+    part = root / f'year={year}' / f'court={court}' / 'bench=b1'
+    part.mkdir(parents=True)
+    duckdb.execute(f"COPY ({sql}) TO '{part}/metadata.parquet' (FORMAT PARQUET)")
+
+
+def test_summary_matches_direct_queries(tmp_path):
+    data_dir = tmp_path / 'data'
+    make_court_dataset(str(data_dir))
+    engine = CourtQueryEngine(str(data_dir))
+    cache = CourtSummaryCache(cache_dir=str(tmp_path / 'cache'))
+    # Nothing is known until the background refresh has run
+    assert cache.version() is None and cache.summary() is None
+
+    version = cache.refresh(engine)
+    summary = cache.summary()
+    assert cache.version() == summary.version == version
+    assert os.path.exists(cache.summary_path(version))
+    assert summary.top_court_by_disposals(2019, 2022) == engine.top_court_by_disposals(2019, 2022)
+    for court in COURTS:
+        assert abs(summary.delay_regression_slope(court) - engine.delay_regression_slope(court)) < 1e-6
+        assert np.allclose(summary.delay_by_year(court)['mean_delay'], engine.delay_by_year(court)['mean_delay'])
+
+    # Same files -> same summary object; a new partition -> a new version
+    assert cache.refresh(engine) == version and cache.summary() is summary
+    write_partition(data_dir, 2024, '1_12', "SELECT '01-01-2024' AS date_of_registration, DATE '2024-02-01' AS decision_date")
+    assert cache.refresh(engine) != version and cache.summary() is not summary
+
+
+def test_ties_go_to_the_same_court_on_both_paths(tmp_path):
+    data_dir = tmp_path / 'data'
+    for court in ('9_13', '1_12', '5_2'):
+        rows = 2 if court == '5_2' else 3
+        write_partition(data_dir, 2030, court, f"SELECT '01-01-2030' AS date_of_registration, "
+                                               f"DATE '2030-02-01' AS decision_date FROM range({rows})")
+    engine = CourtQueryEngine(str(data_dir))
+    cache = CourtSummaryCache(cache_dir=str(tmp_path / 'cache'))
+    cache.refresh(engine)
+    assert engine.top_court_by_disposals(2030, 2030) == cache.summary().top_court_by_disposals(2030, 2030) == '1_12'
+
+
+def test_api_answers_court_questions(caches, tmp_path, monkeypatch):
+    import app
+    import court_summary
+    rows = expected_delays(make_court_dataset(str(tmp_path / 'data')))
+    monkeypatch.setenv('COURT_DATA_PATH', str(tmp_path / 'data'))
+    monkeypatch.setattr(court_engine, '_pool', None)
+    client = app.app.test_client()
+
+    def ask(questions):
+        response = client.post('/api/', data={'questions.txt': (io.BytesIO(questions.encode()), 'questions.txt')})
+        assert response.status_code == 200
+        answers = response.get_json()
+        # The answers by the start of their question
+        return [next(value for key, value in answers.items() if key.startswith(start))
+                for start in ('Which high court', "What's the regression", 'Plot the year')]
+
+    court_rows = rows[rows['court'] == '33_10']
+    slope = np.polyfit(court_rows['year'], court_rows['delay'], 1)[0]
+    try:
+        # Before the background refresh has built the summary, the partitions answer
+        top, answered_slope, plot = ask(COURT_QUESTIONS)
+        assert top == '33_10' and abs(answered_slope - slope) < 1e-5
+        assert plot.startswith('data:image/webp;base64,') and len(plot) < 100_000
+
+        with court_engine.get_court_pool().engine() as engine:
+            court_summary._summary_cache.refresh(engine)
+        assert ask(COURT_QUESTIONS + "\nThanks.")[:2] == [top, answered_slope]
+    finally:
+        court_engine.get_court_pool().close()
+
+
+if __name__ == "__main__":
+    import tempfile
+    for test in (test_partition_paths_prune_years_and_court, test_top_court_by_disposals,
+                 test_delay_regression_slope_matches_numpy, test_pool_reuses_cursors_with_prepared_statements,
+                 test_new_partitions_are_seen_once_the_version_changes, test_summary_matches_direct_queries,
+                 test_ties_go_to_the_same_court_on_both_paths):
+        with tempfile.TemporaryDirectory() as tmp:
+            from pathlib import Path
+            test(Path(tmp))
+            print(f"✅ {test.__name__}")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-disk HTTP cache against a local stub server (no network)
+Run with: python -m pytest test_http_cache.py
+"""
+
+from conftest import stub_server
+from http_cache import HttpCache
+
+
+def test_fresh_entry_skips_network(tmp_path):
+    with stub_server({'/page/1': b'<html>films</html>'}) as (server, base):
+        cache = HttpCache(str(tmp_path), ttl=60)
+        first = cache.get(f"{base}/page/1")
+        second = cache.get(f"{base}/page/1")
+        assert first.content == second.content == b'<html>films</html>'
+        assert not first.from_cache and second.from_cache
+        assert len(server.hits) == 1
+
+
+def test_stale_entry_revalidates_with_etag(tmp_path):
+    with stub_server({'/page/1': b'<html>films</html>'}) as (server, base):
+        cache = HttpCache(str(tmp_path), ttl=0)
+        first = cache.get(f"{base}/page/1")
+        second = cache.get(f"{base}/page/1")
+        assert second.revalidated and second.content == first.content
+        assert server.hits[1] == ('/page/1', first.etag)
+
+        server.pages['/page/1'] = b'<html>updated</html>'
+        third = cache.get(f"{base}/page/1")
+        assert not third.from_cache and third.content == b'<html>updated</html>'
+
+
+def test_shared_directory_between_instances(tmp_path):
+    with stub_server({'/page/1': b'x' * 100}) as (server, base):
+        HttpCache(str(tmp_path), ttl=60).get(f"{base}/page/1")
+        # A second worker sees the entry written by the first
+        assert HttpCache(str(tmp_path), ttl=60).get(f"{base}/page/1").from_cache
+        assert len(server.hits) == 1
+
+
+def test_lru_eviction_respects_max_bytes(tmp_path):
+    pages = {f'/page/{i}': bytes([65 + i]) * 400 for i in range(3)}
+    with stub_server(pages) as (server, base):
+        cache = HttpCache(str(tmp_path), ttl=60, max_bytes=1000)
+        cache.get(f"{base}/page/0")
+        cache.get(f"{base}/page/1")
+        cache.get(f"{base}/page/0")  # page 1 is now least recently used
+        cache.get(f"{base}/page/2")
+        assert len(server.hits) == 3
+        assert cache.get(f"{base}/page/0").from_cache
+        assert not cache.get(f"{base}/page/1").from_cache
+
+
+def test_serves_stale_copy_when_upstream_fails(tmp_path):
+    with stub_server({'/page/1': b'cached'}) as (server, base):
+        cache = HttpCache(str(tmp_path), ttl=0)
+        cache.get(f"{base}/page/1")
+        server.fail = True
+        response = cache.get(f"{base}/page/1")
+        assert response.stale and response.content == b'cached'
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_fresh_entry_skips_network, test_stale_entry_revalidates_with_etag,
+                 test_shared_directory_between_instances, test_lru_eviction_respects_max_bytes,
+                 test_serves_stale_copy_when_upstream_fails):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+            print(f"✅ {test.__name__}")
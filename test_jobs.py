@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite job queue and its scheduler
+Run with: python -m pytest test_jobs.py
+"""
+
+import io
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import JobQueue, JobScheduler, describe_job
+
+
+def wait_for(queue, job_id, status='done', timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] == status:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} is {queue.get(job_id)['status']}, not {status}")
+
+
+def test_claims_follow_priority_and_the_concurrency_limit(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), max_concurrency=2)
+    low = queue.submit('low', 'low')
+    first = queue.submit('first')
+    second = queue.submit('second')
+    urgent = queue.submit('urgent', 'high')
+    with pytest.raises(ValueError):
+        queue.submit('x', 'urgent')
+
+    assert queue.get(low)['position'] == 3
+    assert queue.claim() == (urgent, 'urgent')
+    assert queue.claim() == (first, 'first')
+    assert queue.claim() is None  # two already running
+
+    queue.finish(urgent, b'[1]', 'MISS')
+    assert queue.claim() == (second, 'second')
+    assert describe_job(queue.get(urgent))['result'] == [1]
+
+
+def test_jobs_whose_lease_expired_are_requeued(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), lease=60)
+    job_id = queue.submit('q')
+    queue.claim()
+    queue.recover()
+    assert queue.get(job_id)['status'] == 'running'
+    # A worker on another host (e.g. before a container restart) that stopped renewing the lease
+    with jobs.closing(queue._connect()) as conn:
+        conn.execute("UPDATE jobs SET worker = 'old-container:1', heartbeat_at = ? WHERE id = ?",
+                     (time.time() - 61, job_id))
+    queue.recover()
+    assert queue.get(job_id)['status'] == 'queued'
+
+
+def test_running_jobs_keep_their_lease(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), lease=0.3)
+    release = threading.Event()
+
+    def run_job(questions_text):
+        release.wait(5)
+        return b'[]', 'MISS'
+
+    job_id = queue.submit('slow')
+    scheduler = JobScheduler(queue, run_job, poll_interval=0.02)
+    try:
+        wait_for(queue, job_id, 'running')
+        for _ in range(10):
+            time.sleep(0.1)
+            queue.recover()
+            assert queue.get(job_id)['status'] == 'running'
+        release.set()
+        wait_for(queue, job_id)
+    finally:
+        release.set()
+        scheduler.close()
+
+
+def test_scheduler_runs_jobs_and_records_failures(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), max_concurrency=2)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def run_job(questions_text):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+        if questions_text == 'boom':
+            raise ValueError('bad questions')
+        return f'["{questions_text}"]'.encode(), 'MISS'
+
+    ids = [queue.submit(f'q{i}') for i in range(5)]
+    failing = queue.submit('boom')
+    scheduler = JobScheduler(queue, run_job, poll_interval=0.05)
+    try:
+        for i, job_id in enumerate(ids):
+            assert describe_job(wait_for(queue, job_id))['result'] == [f'q{i}']
+        assert describe_job(wait_for(queue, failing, 'failed'))['error'] == 'bad questions'
+    finally:
+        scheduler.close()
+    assert max(peak) <= 2
+
+
+def test_submit_and_poll_routes(tmp_path, monkeypatch):
+    import app
+    monkeypatch.setattr(jobs, '_job_queue', JobQueue(str(tmp_path / 'jobs.sqlite3')))
+    monkeypatch.setattr(jobs, '_scheduler', None)
+    monkeypatch.setattr(app, 'answer_questions', lambda text: (b'["answered"]\n', 'MISS'))
+    client = app.app.test_client()
+
+    submitted = client.post('/api/jobs', data={'questions.txt': (io.BytesIO(b'What?'), 'questions.txt'),
+                                               'priority': 'high'})
+    assert submitted.status_code == 202
+    job_id = submitted.get_json()['id']
+    assert submitted.headers['Location'] == f'/api/jobs/{job_id}'
+
+    wait_for(jobs.get_job_queue(), job_id)
+    status = client.get(f'/api/jobs/{job_id}').get_json()
+    assert status['status'] == 'done' and status['priority'] == 'high'
+    assert status['result'] == ['answered']
+    assert client.get('/api/jobs/unknown').status_code == 404
+    assert client.post('/api/jobs', data={}).status_code == 400
+    jobs._scheduler.close()
+
+
+def test_jobs_queued_before_startup_run_without_a_request(caches, monkeypatch):
+    from starlette.testclient import TestClient
+    import app
+    import asgi
+    monkeypatch.setattr(app, 'answer_questions', lambda text: (b'["answered"]\n', 'MISS'))
+    # Left in the database by a previous run of the service
+    job_id = jobs.get_job_queue().submit('What?')
+    with TestClient(asgi.app):
+        assert describe_job(wait_for(jobs.get_job_queue(), job_id))['result'] == ['answered']
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_claims_follow_priority_and_the_concurrency_limit, test_jobs_whose_lease_expired_are_requeued,
+                 test_running_jobs_keep_their_lease, test_scheduler_runs_jobs_and_records_failures):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ job queue tests passed")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for lazy module imports
+Run with: python -m pytest test_lazy_imports.py
+"""
+
+import logging
+import sys
+import time
+
+from lazy_imports import lazy_import, prewarm, report_import_time
+
+
+def make_module(tmp_path, monkeypatch, name):
+    (tmp_path / f"{name}.py").write_text("VALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, name, raising=False)
+
+
+def test_module_is_imported_on_first_use(tmp_path, monkeypatch):
+    make_module(tmp_path, monkeypatch, 'lazy_sample')
+    hooked = []
+    module = lazy_import('lazy_sample', on_import=hooked.append)
+    assert 'lazy_sample' not in sys.modules and not hooked
+
+    assert module.VALUE == 42
+    assert 'lazy_sample' in sys.modules
+    assert module.VALUE == 42
+    assert hooked == [sys.modules['lazy_sample']]  # the hook runs once
+
+    module.VALUE = 7  # attribute writes reach the real module
+    assert sys.modules['lazy_sample'].VALUE == 7
+
+
+def test_eager_mode_and_prewarm(tmp_path, monkeypatch):
+    make_module(tmp_path, monkeypatch, 'eager_sample')
+    monkeypatch.setenv('LAZY_IMPORTS', '0')
+    lazy_import('eager_sample')
+    assert 'eager_sample' in sys.modules
+
+    make_module(tmp_path, monkeypatch, 'warm_sample')
+    monkeypatch.setenv('LAZY_IMPORTS', '1')
+    module = lazy_import('warm_sample')
+    called = []
+    prewarm([module], extra=lambda: called.append(True))
+    assert 'warm_sample' in sys.modules and called == [True]
+
+
+def test_import_budget_is_reported(monkeypatch, caplog):
+    monkeypatch.setenv('IMPORT_BUDGET_MS', '50')
+    with caplog.at_level(logging.INFO, logger='lazy_imports'):
+        assert report_import_time('fast', time.perf_counter()) < 50
+        report_import_time('slow', time.perf_counter() - 1)
+    levels = {record.getMessage().split()[0]: record.levelname for record in caplog.records}
+    assert levels == {'fast': 'INFO', 'slow': 'WARNING'}
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for stage spans, histograms and the /metrics endpoint
+Run with: python -m pytest test_metrics.py
+"""
+
+import io
+import time
+
+import metrics
+from metrics import Histogram, collect_spans, render_metrics, server_timing, span
+from app import FILMS_URL
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('test_latency_seconds', 'Test latency', ['stage'], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, stage='a "b"')
+    text = render_metrics()
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{stage="a \\"b\\"",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{stage="a \\"b\\"",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{stage="a \\"b\\"",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{stage="a \\"b\\""} 3' in text
+
+
+def test_spans_reach_enclosing_collectors_and_server_timing():
+    with collect_spans() as outer:
+        with collect_spans() as inner:
+            with span('test.step'):
+                time.sleep(0.01)
+        with span('test.step'):
+            pass
+    assert [stage for stage, _ in inner] == ['test.step']
+    assert [stage for stage, _ in outer] == ['test.step', 'test.step']
+    header = server_timing([('a', 0.0125), ('b', 0.002), ('a', 0.001)])
+    assert header == 'a;dur=13.5, b;dur=2.0'
+    assert 'analysis_stage_seconds_count{stage="test.step"}' in render_metrics()
+
+
+def test_films_request_reports_stages(films_page, monkeypatch):
+    import app
+    monkeypatch.setenv('SERVER_TIMING', '1')
+    client = app.app.test_client()
+    questions = f"Scrape {FILMS_URL}\n1. How many $2 bn movies were released before 2000?"
+    response = client.post('/api/', data={'questions.txt': (io.BytesIO(questions.encode()), 'questions.txt')})
+    assert response.status_code == 200
+    stages = {entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')}
+    assert {'films.fetch', 'films.parse', 'films.clean', 'films.stats', 'plot.fit', 'plot.render'} <= stages
+
+    scraped = client.get('/metrics')
+    assert scraped.content_type == metrics.CONTENT_TYPE
+    text = scraped.get_data(as_text=True)
+    assert 'analysis_stage_seconds_bucket{stage="plot.render",le="+Inf"}' in text
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/",status="200"}' in text
+    assert 'api_responses_total{cache="MISS"}' in text
+    # Health checks do not carry a Server-Timing header
+    assert 'Server-Timing' not in client.get('/health').headers
+
+
+if __name__ == "__main__":
+    test_histogram_buckets_are_cumulative()
+    test_spans_reach_enclosing_collectors_and_server_timing()
+    print("✅ metrics tests passed (run the route test with pytest)")
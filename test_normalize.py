@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorized currency/year/integer parsing
+Run with: python -m pytest test_normalize.py
+"""
+
+import math
+
+import pandas as pd
+
+from normalize import parse_currency_series, extract_year_series, extract_int_series
+
+
+def test_currency_handles_prefixes_suffixes_and_footnotes():
+    values = pd.Series(['$2,923,706,026', 'T$2,257,844,554', 'F8$1,238,764,765', '$1.5 billion',
+                        'US$800m', '$2.1 bn[3]', '[1]$5', 'n/a', None, 2000000000])
+    assert parse_currency_series(values).tolist() == [
+        2923706026.0, 2257844554.0, 1238764765.0, 1.5e9, 8e8, 2.1e9, 5.0, 0.0, 0.0, 2e9]
+
+
+def test_year_takes_first_year_of_a_range():
+    years = extract_year_series(pd.Series(['2009', '2019–2020', '1997[a]', 'TBA', None]))
+    assert years.tolist()[:3] == [2009.0, 2019.0, 1997.0]
+    assert math.isnan(years.iloc[3]) and math.isnan(years.iloc[4])
+
+
+def test_integers_keep_the_index():
+    ranks = extract_int_series(pd.Series(['1', '4[# 1]', 'RK', 7], index=[10, 11, 12, 13]))
+    assert list(ranks.index) == [10, 11, 12, 13]
+    assert ranks[10] == 1 and ranks[11] == 4 and math.isnan(ranks[12]) and ranks[13] == 7
+
+
+if __name__ == "__main__":
+    test_currency_handles_prefixes_suffixes_and_footnotes()
+    test_year_takes_first_year_of_a_range()
+    test_integers_keep_the_index()
+    print("✅ normalize tests passed")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for in-memory plot rendering
+Run with: python -m pytest test_plotting.py
+"""
+
+import base64
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+
+from plotting import render_figure, to_data_uri, encode_to_budget, PlotService, REGRESSION_STYLE
+
+
+def test_render_reuses_buffer_and_encodes_png():
+    fig, ax = plt.subplots(figsize=(4, 3))
+    ax.scatter([1, 2, 3], [2, 4, 5])
+    first, size = render_figure(fig, 'png', dpi=50)
+    uri = to_data_uri(first, 'png')
+    second, smaller = render_figure(fig, 'png', dpi=25)
+    plt.close(fig)
+
+    assert second is first  # same per-thread buffer, truncated between renders
+    assert smaller < size
+    assert uri.startswith('data:image/png;base64,')
+    assert base64.b64decode(uri.split(',', 1)[1])[:8] == b'\x89PNG\r\n\x1a\n'
+    assert len(base64.b64decode(to_data_uri(second, 'png').split(',', 1)[1])) == smaller
+
+
+def busy_figure():
+    rng = np.random.default_rng(0)
+    fig, ax = plt.subplots(figsize=(6, 4))
+    ax.scatter(rng.random(3000), rng.random(3000), c=rng.random(3000), s=20)
+    return fig
+
+
+def test_encode_to_budget_png_and_webp():
+    fig = busy_figure()
+    plain = encode_to_budget(fig, 'png', max_chars=10 ** 7)
+    assert plain.passes == 1 and plain.colors is None and plain.dpi == 100
+
+    small = encode_to_budget(fig, 'png', max_chars=30000)
+    assert len(small.data_uri) <= 30000
+    assert small.colors is not None or small.dpi < 100
+
+    webp = encode_to_budget(fig, 'webp', max_chars=20000)
+    plt.close(fig)
+    assert webp.data_uri.startswith('data:image/webp;base64,')
+    assert len(webp.data_uri) <= 20000 and webp.quality is not None
+    assert base64.b64decode(webp.data_uri.split(',', 1)[1])[8:12] == b'WEBP'
+
+
+def test_plot_service_reuses_templates_across_threads():
+    service = PlotService(pool_size=2)
+    x = np.arange(10.0)
+
+    def draw(i):
+        return service.scatter(x, x * i, 'x', f'y{i}', f'plot {i}', line=(x, x * i), line_label='fit')
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        images = list(pool.map(draw, range(8)))
+    assert all(image.data_uri.startswith('data:image/png;base64,') for image in images)
+    assert len({image.data_uri for image in images}) == 8
+    assert service._pools[REGRESSION_STYLE].qsize() <= 2
+
+    # A template keeps its artists, and the limits follow the new data
+    with service.template() as template:
+        template.update([0, 100], [0, 5], 'a', 'b', 'c')
+        assert template.ax.get_xlim()[1] >= 100
+        assert not template.line.get_visible()
+        assert len(template.ax.collections) == 1
+
+
+if __name__ == "__main__":
+    test_render_reuses_buffer_and_encodes_png()
+    test_encode_to_budget_png_and_webp()
+    test_plot_service_reuses_templates_across_threads()
+    print("✅ plotting tests passed")
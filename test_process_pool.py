@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the analysis worker pool
+Run with: python -m pytest test_process_pool.py
+"""
+
+import operator
+import os
+import threading
+import time
+
+import pytest
+
+from process_pool import AnalysisPool, JobCancelled, JobTimeout
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = AnalysisPool(processes=2, timeout=30, preload=())
+    yield pool
+    pool.close()
+
+
+def test_jobs_run_in_worker_processes(pool):
+    assert pool.run(operator.add, 2, 3) == 5
+    pids = {pool.run(os.getpid) for _ in range(4)}
+    assert os.getpid() not in pids
+    with pytest.raises(ValueError):
+        pool.run(int, 'not a number')
+
+
+def test_timeout_replaces_the_worker(pool):
+    with pytest.raises(JobTimeout):
+        pool.run(time.sleep, 30, timeout=0.2)
+    # Both workers are usable again afterwards
+    assert sorted(pool.run(operator.mul, n, n) for n in range(4)) == [0, 1, 4, 9]
+
+
+def test_waiting_for_a_busy_pool_counts_against_the_timeout(pool):
+    busy = [threading.Thread(target=pool.run, args=(time.sleep, 1)) for _ in range(2)]
+    for thread in busy:
+        thread.start()
+    time.sleep(0.2)
+    started = time.monotonic()
+    with pytest.raises(JobTimeout):
+        pool.run(operator.neg, 1, timeout=0.2)
+    assert time.monotonic() - started < 0.8
+    for thread in busy:
+        thread.join()
+    assert pool.run(operator.neg, 1) == -1
+
+
+def test_cancel_stops_a_running_job(pool):
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    started = time.monotonic()
+    with pytest.raises(JobCancelled):
+        pool.run(time.sleep, 30, cancel=cancel)
+    assert time.monotonic() - started < 5
+    assert pool.run(operator.neg, 1) == -1
+
+
+if __name__ == "__main__":
+    pool = AnalysisPool(processes=2, timeout=30, preload=())
+    try:
+        for test in (test_jobs_run_in_worker_processes, test_timeout_replaces_the_worker,
+                     test_waiting_for_a_busy_pool_counts_against_the_timeout, test_cancel_stops_a_running_job):
+            test(pool)
+    finally:
+        pool.close()
+    print("✅ process pool tests passed")
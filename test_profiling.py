@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for on-demand request profiling
+Run with: python -m pytest test_profiling.py
+"""
+
+import io
+import pstats
+import time
+
+import pytest
+
+import profiling
+from conftest import FILMS_QUESTIONS
+from profiling import ProfileStore, make_request_id, profile_call
+
+
+def busy(n):
+    total = 0
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        total += sum(range(n))
+    return total
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ProfileStore(str(tmp_path), max_files=2)
+    monkeypatch.setattr(profiling, '_profile_store', store)
+    return store
+
+
+def test_profiles_are_stored_by_request_id(store):
+    result, path = profile_call('req-1', 'pstats', busy, 100)
+    assert result > 0 and store.find('req-1') == (path, 'pstats')
+    assert any(func[2] == 'busy' for func in pstats.Stats(path).stats)
+
+    _, path = profile_call('req-2', 'collapsed', busy, 100)
+    with open(path) as f:
+        stack, count = f.readline().rsplit(' ', 1)
+    assert 'busy (test_profiling.py:' in stack and int(count) > 0
+
+    time.sleep(0.01)
+    profile_call('req-3', 'pstats', sum, [1])
+    assert store.find('req-1') is None  # pruned, only the newest two are kept
+    assert store.find('../etc/passwd') is None
+    assert make_request_id('abc-1') == 'abc-1' and make_request_id('a/b') != 'a/b'
+
+
+def post_questions(client, headers=None):
+    return client.post('/api/', headers=headers or {},
+                       data={'questions.txt': (io.BytesIO(b'What is the mean?'), 'questions.txt')})
+
+
+def test_profile_header_needs_the_token(store, monkeypatch):
+    import app
+    client = app.app.test_client()
+    # Without PROFILE_TOKEN the header is ignored
+    monkeypatch.delenv('PROFILE_TOKEN', raising=False)
+    assert 'X-Profile-Url' not in post_questions(client, {'X-Profile': 'anything'}).headers
+
+    monkeypatch.setenv('PROFILE_TOKEN', 'secret')
+    assert post_questions(client, {'X-Profile': 'wrong'}).status_code == 403
+    assert post_questions(client, {'X-Profile': 'secret', 'X-Profile-Format': 'svg'}).status_code == 400
+
+    response = post_questions(client, {'X-Profile': 'secret', 'X-Request-Id': 'slow-1',
+                                       'X-Profile-Format': 'collapsed'})
+    assert response.get_json() == ["No specific analysis available"]
+    assert response.headers['X-Cache'] == 'BYPASS' and response.headers['X-Request-Id'] == 'slow-1'
+
+    url = response.headers['X-Profile-Url']
+    assert client.get(url).status_code == 403
+    download = client.get(url, headers={'X-Profile': 'secret'})
+    assert download.status_code == 200 and download.mimetype == 'text/plain'
+    assert client.get('/api/profiles/unknown', headers={'X-Profile': 'secret'}).status_code == 404
+
+
+def test_films_profile_shows_parsing_and_plotting(films_page, monkeypatch):
+    import app
+    monkeypatch.setenv('PROFILE_TOKEN', 'secret')
+    response = app.app.test_client().post('/api/', headers={'X-Profile': 'secret', 'X-Request-Id': 'films-1'},
+                                          data={'questions.txt': (io.BytesIO(FILMS_QUESTIONS.encode()), 'questions.txt')})
+    assert response.status_code == 200 and len(response.get_json()) == 4
+    path, _ = profiling.get_profile_store().find('films-1')
+    # The plan ran in the profiled thread, not on the plan pool
+    functions = {func[2] for func in pstats.Stats(path).stats}
+    assert {'parse_films_table', 'prepare_films_frame', 'encode_to_budget', 'savefig'} <= functions
+
+
+if __name__ == "__main__":
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        profiling._profile_store = ProfileStore(tmp, max_files=2)
+        test_profiles_are_stored_by_request_id(profiling._profile_store)
+    print("✅ profiling tests passed (run the route test with pytest)")
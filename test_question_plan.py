@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the question plan: shared nodes, parallel branches and film question order
+Run with: python -m pytest test_question_plan.py
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app
+from conftest import FILMS_QUESTIONS as QUESTIONS
+from question_plan import Plan, match_operations, numbered_questions
+
+
+def test_shared_nodes_run_once_and_branches_run_in_parallel():
+    calls = []
+    barrier = threading.Barrier(2, timeout=5)
+
+    def branch(name):
+        def run(series):
+            barrier.wait()  # both branches must be running at once
+            calls.append(name)
+            return (name, len(series))
+        return run
+
+    plan = Plan()
+    plan.add('load', lambda: calls.append('load') or [3, 1, 2])
+    plan.add('clean', lambda rows: calls.append('clean') or sorted(rows), 'load')
+    plan.add('stats', branch('stats'), 'clean')
+    plan.add('plot', branch('plot'), 'clean')
+    plan.add('unused', lambda: calls.append('unused'))
+
+    finished = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results, errors = plan.run(['stats', 'plot'], executor=executor,
+                                   on_result=lambda name, result, error: finished.append(name))
+    assert errors == {}
+    assert results['stats'] == ('stats', 3) and results['plot'] == ('plot', 3)
+    assert calls.count('load') == 1 and calls.count('clean') == 1 and 'unused' not in calls
+    assert finished[:2] == ['load', 'clean'] and set(finished[2:]) == {'stats', 'plot'}
+
+    with pytest.raises(KeyError):
+        plan.add('orphan', len, 'missing')
+
+
+def test_failures_reach_dependents_only():
+    def broken():
+        raise ValueError('no peak column')
+
+    plan = Plan()
+    plan.add('rank_peak', broken)
+    plan.add('correlation', lambda series: 1.0, 'rank_peak')
+    plan.add('count', lambda: 7)
+    results, errors = plan.run()
+    assert results == {'count': 7}
+    assert set(errors) == {'rank_peak', 'correlation'}
+    assert isinstance(errors['correlation'], ValueError)
+
+
+def test_numbered_questions_map_to_operations():
+    questions = numbered_questions(QUESTIONS)
+    assert [n for n, _ in questions] == [1, 2, 3, 4]
+    assert match_operations(questions, app.FILM_QUESTION_RULES) == list(app.STANDARD_FILM_ANSWERS)
+    assert match_operations([(1, 'What is the median?')], app.FILM_QUESTION_RULES) == [None]
+
+
+def test_film_answers_follow_the_question_order(films_page):
+    analyst = app.DataAnalyst()
+    standard = analyst.analyze_films_data(QUESTIONS)
+    assert not analyst.degraded
+    assert isinstance(standard[0], int) and standard[3].startswith('data:image/png;base64,')
+
+    lines = QUESTIONS.splitlines()
+    reordered = '\n'.join(lines[:3] + [lines[5], lines[3], lines[6], lines[4]])
+    answers = analyst.analyze_films_data(reordered)
+    assert answers[0] == standard[2] and answers[1] == standard[0] and answers[3] == standard[1]
+    assert answers[2].startswith('data:image/png;base64,')
+
+    # A partial question set keeps the four-answer shape
+    assert len(analyst.analyze_films_data('\n'.join(lines[:4]))) == 4
+
+
+if __name__ == "__main__":
+    test_shared_nodes_run_once_and_branches_run_in_parallel()
+    test_failures_reach_dependents_only()
+    test_numbered_questions_map_to_operations()
+    print("✅ Question plan tests passed")
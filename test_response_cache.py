@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the whole-response cache
+Run with: python -m pytest test_response_cache.py
+"""
+
+import os
+import time
+
+from response_cache import ResponseCache, normalize_questions, response_key
+
+
+def test_key_ignores_whitespace_but_not_content_or_version():
+    text = "Scrape the list.\n\n1. How many films?\n2. Which is earliest?\n"
+    messy = "  Scrape the list.  \r\n\r\n\r\n1.  How many   films?\r\n2. Which is earliest?"
+    assert normalize_questions(messy) == normalize_questions(text)
+    assert response_key(messy, 'v1') == response_key(text, 'v1')
+    assert response_key(text, 'v1') != response_key(text, 'v2')
+    assert response_key(text, 'v1') != response_key(text.replace('earliest', 'latest'), 'v1')
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    cache = ResponseCache(max_entries=2, cache_dir=str(tmp_path))
+    assert cache.get('k0') is None
+    for i in range(3):
+        cache.put(f'k{i}', f'[{i}]'.encode())
+    assert list(cache._memory) == ['k1', 'k2']
+    assert cache.get('k0') == b'[0]'  # still on disk
+
+    # Another worker sees the entries through the shared directory
+    other = ResponseCache(max_entries=2, cache_dir=str(tmp_path))
+    assert other.get('k2') == b'[2]'
+
+    memory_only = ResponseCache(cache_dir=str(tmp_path), disk=False)
+    assert memory_only.get('k2') is None
+
+
+def test_entries_expire(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.put('short', b'[1]', ttl=0.05)
+    cache.put('long', b'[2]')
+    assert cache.get('short') == b'[1]'
+    time.sleep(0.1)
+    assert cache.get('short') is None
+    assert cache.get('long') == b'[2]'
+
+    # Writing sweeps expired files out of the shared directory
+    cache.put('gone', b'[3]', ttl=-1)
+    assert sorted(os.listdir(tmp_path)) == ['.sweep.lock', 'long.response']
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_key_ignores_whitespace_but_not_content_or_version()
+    for test in (test_memory_and_disk_tiers, test_entries_expire):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ response cache tests passed")
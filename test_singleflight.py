@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for single-flight deduplication
+Run with: python -m pytest test_singleflight.py
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from file_lock import file_lock
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_computation(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'answer'
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(flight.do, 'k', compute)
+        started.wait()
+        followers = [pool.submit(flight.do, 'k', compute) for _ in range(4)]
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1
+    assert results[0] == ('answer', False)
+    assert all(result == ('answer', True) for result in results[1:])
+    # The key is released, so a later call computes again
+    assert flight.do('k', lambda: 'again') == ('again', False)
+
+
+def test_errors_reach_every_waiter(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError('upstream down')
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, 'k', fail)
+        started.wait()
+        follower = pool.submit(flight.do, 'k', fail)
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_workers_serialize_on_the_file_lock(tmp_path):
+    # Two groups sharing a lock directory stand in for two gunicorn workers
+    store = {}
+    calls = []
+
+    def compute():
+        if 'k' in store:
+            return store['k']
+        calls.append(1)
+        time.sleep(0.2)
+        store['k'] = 'answer'
+        return 'answer'
+
+    workers = [SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(lambda w: w.do('k', compute), workers))
+    assert len(calls) == 1
+    assert [value for value, _ in results] == ['answer', 'answer']
+
+
+def test_waiters_stop_waiting_after_their_timeout(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 'slow'
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flight.do, 'k', slow)
+        started.wait()
+        assert flight.do('k', lambda: 'own', timeout=0.1) == ('own', False)
+        release.set()
+        assert leader.result() == ('slow', False)
+
+
+def test_leaders_stop_waiting_for_another_workers_lock(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    # Another worker holds the key's lock for longer than the caller can wait
+    with file_lock(os.path.join(str(tmp_path), 'k.lock')):
+        started = time.monotonic()
+        assert flight.do('k', lambda: 'own', timeout=0.2) == ('own', False)
+        assert time.monotonic() - started < 1
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_concurrent_callers_share_one_computation, test_errors_reach_every_waiter,
+                 test_workers_serialize_on_the_file_lock, test_waiters_stop_waiting_after_their_timeout,
+                 test_leaders_stop_waiting_for_another_workers_lock):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ single-flight tests passed")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for NDJSON streaming of /api/ answers (Accept: application/x-ndjson)
+Run with: python -m pytest test_streaming.py
+"""
+
+import io
+import json
+import time
+
+from starlette.testclient import TestClient
+
+import app
+import asgi
+from conftest import FILMS_QUESTIONS as QUESTIONS
+
+NDJSON = {'Accept': 'application/x-ndjson'}
+
+
+def post(client, text, headers=None):
+    return client.post('/api/', headers=headers or {},
+                       data={'questions.txt': (io.BytesIO(text.encode()), 'questions.txt')})
+
+
+def test_answers_stream_before_the_plot(films_page, monkeypatch):
+    rank_peak_plot = app.DataAnalyst.rank_peak_plot
+    monkeypatch.setattr(app.DataAnalyst, 'rank_peak_plot',
+                        lambda self, rank_peak: time.sleep(0.3) or rank_peak_plot(self, rank_peak))
+
+    client = app.app.test_client()
+    streamed = post(client, QUESTIONS, NDJSON)
+    assert streamed.status_code == 200 and streamed.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in streamed.get_data(as_text=True).splitlines()]
+    assert sorted(line['index'] for line in lines[:-1]) == [0, 1, 2, 3]
+    assert lines[-2]['index'] == 3  # the slow plot comes last
+    assert lines[-1]['cache'] == 'MISS'
+    assert [line['answer'] for line in sorted(lines[:-1], key=lambda line: line['index'])] == lines[-1]['answers']
+
+    # The assembled payload is the plain /api/ response
+    plain = post(client, QUESTIONS)
+    assert plain.headers['X-Cache'] == 'HIT'
+    assert plain.get_json() == lines[-1]['answers']
+
+    # A cache hit streams its answers too
+    hit = [json.loads(line) for line in post(client, QUESTIONS, NDJSON).get_data(as_text=True).splitlines()]
+    assert [line.get('index') for line in hit] == [0, 1, 2, 3, None]
+    assert hit[-1] == {'cache': 'HIT', 'answers': lines[-1]['answers']}
+
+
+def test_generic_questions_stream_on_both_servers(caches):
+    expected = [{'index': 0, 'answer': "No specific analysis available"},
+                {'cache': 'MISS', 'answers': ["No specific analysis available"]}]
+    response = post(app.app.test_client(), 'What is the mean?', NDJSON)
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == expected
+
+    with TestClient(asgi.app) as client:
+        response = client.post('/api/', headers=NDJSON,
+                               files={'questions.txt': ('questions.txt', io.BytesIO(b'What is the median?'))})
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.text.splitlines()][-1]['cache'] == 'MISS'
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the parsed-table cache
+Run with: python -m pytest test_table_cache.py
+"""
+
+import os
+import time
+
+import pandas as pd
+
+from table_cache import TableCache, content_key
+
+
+def sample_frame():
+    return pd.DataFrame({
+        'Title': ['Avatar', 'Titanic'],
+        'gross_numeric': [2923706026.0, 2257844554.0],
+        'year_numeric': [2009.0, 1997.0],
+    })
+
+
+def test_key_depends_on_content_and_schema_version():
+    assert content_key(b'<html>a</html>', 'v1') == content_key(b'<html>a</html>', 'v1')
+    assert content_key(b'<html>a</html>', 'v1') != content_key(b'<html>b</html>', 'v1')
+    assert content_key(b'<html>a</html>', 'v1') != content_key(b'<html>a</html>', 'v2')
+
+
+def test_round_trip_memory_and_disk(tmp_path):
+    key = content_key(b'page', 'v1')
+    cache = TableCache(str(tmp_path))
+    assert cache.get(key) is None
+    cache.put(key, sample_frame())
+
+    from_memory = cache.get(key)
+    pd.testing.assert_frame_equal(from_memory, sample_frame())
+    # Callers may add columns without changing the cached copy
+    from_memory['extra'] = 1
+    assert 'extra' not in cache.get(key).columns
+
+    # A fresh instance (another worker) reads the Parquet file
+    from_disk = TableCache(str(tmp_path)).get(key)
+    pd.testing.assert_frame_equal(from_disk, sample_frame())
+
+
+def test_memory_tier_is_bounded(tmp_path):
+    cache = TableCache(str(tmp_path), memory_entries=2)
+    for i in range(3):
+        cache.put(f'k{i}', sample_frame())
+    assert list(cache._memory) == ['k1', 'k2']
+    assert cache.get('k0') is not None  # still on disk
+
+
+def test_disk_tier_evicts_old_and_least_recently_used_files(tmp_path):
+    cache = TableCache(str(tmp_path), memory_entries=0, max_age=3600)
+    cache.put('old', sample_frame())
+    cache.put('k0', sample_frame())
+    two_hours_ago, a_minute_ago = time.time() - 7200, time.time() - 60
+    os.utime(tmp_path / 'old.parquet', (two_hours_ago, two_hours_ago))
+    os.utime(tmp_path / 'k0.parquet', (a_minute_ago, a_minute_ago))
+    cache.max_bytes = os.path.getsize(tmp_path / 'k0.parquet') * 2
+    cache.put('k1', sample_frame())
+    assert not (tmp_path / 'old.parquet').exists()  # past max_age
+    assert cache.get('k0') is not None  # reading it makes it the most recently used
+
+    cache.put('k2', sample_frame())
+    assert sorted(os.listdir(tmp_path)) == ['.evict.lock', 'k0.parquet', 'k2.parquet']
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_key_depends_on_content_and_schema_version()
+    for test in (test_round_trip_memory_and_disk, test_memory_tier_is_bounded,
+                 test_disk_tier_evicts_old_and_least_recently_used_files):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ table cache tests passed")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for the lxml wikitable extractor
+Run with: python -m pytest test_table_extract.py
+"""
+
+from table_extract import extract_wikitable
+from benchmarks.fixtures import make_films_html
+
+
+def test_films_page_main_table():
+    headers, rows = extract_wikitable(make_films_html(n_rows=30))
+    assert headers == ['Rank', 'Peak', 'Title', 'Worldwide gross', 'Year', 'Ref']
+    assert len(rows) == 30
+    # Citation markers are stripped and inline elements keep their spacing
+    assert rows[0][2] == 'Avatar'
+    assert rows[0][1] == '1'
+    assert rows[4][2] == 'Star Wars: The Force Awakens'
+
+
+def test_rowspan_and_colspan_are_expanded():
+    html = b'''<html><body><table class="wikitable sortable">
+        <tr><th>Rank</th><th colspan="2">Film</th></tr>
+        <tr><td rowspan="2">1</td><td>Avatar</td><td>2009</td></tr>
+        <tr><td>Titanic</td><td>1997</td></tr>
+        <tr><td>3</td><td colspan="2">Tie</td></tr>
+    </table></body></html>'''
+    headers, rows = extract_wikitable(html)
+    assert headers == ['Rank', 'Film', 'Film']
+    assert rows == [['1', 'Avatar', '2009'], ['1', 'Titanic', '1997'], ['3', 'Tie', 'Tie']]
+
+
+def test_prefers_sortable_table_and_falls_back_to_first_wikitable():
+    html = b'''<table class="wikitable"><tr><th>A</th></tr><tr><td>first</td></tr></table>
+        <table class="wikitable sortable"><tr><th>B</th></tr><tr><td>sortable</td></tr></table>'''
+    assert extract_wikitable(html) == (['B'], [['sortable']])
+    assert extract_wikitable(html.split(b'\n')[0]) == (['A'], [['first']])
+    assert extract_wikitable(b'<html><body><p>no tables</p></body></html>') is None
+
+
+def test_stops_after_target_table():
+    # Anything after the target table is never parsed, however large or broken
+    html = make_films_html(n_rows=5, padding_paragraphs=10) + b'<table class="wikitable sortable"><tr><th>X'
+    headers, rows = extract_wikitable(html)
+    assert headers[0] == 'Rank' and len(rows) == 5
+
+
+if __name__ == "__main__":
+    for test in (test_films_page_main_table, test_rowspan_and_colspan_are_expanded,
+                 test_prefers_sortable_table_and_falls_back_to_first_wikitable, test_stops_after_target_table):
+        test()
+        print(f"✅ {test.__name__}")